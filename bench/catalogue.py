@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from fetch_tsdb import LEAGUES
+from identity import slugify
+from stubs import load_fixture
+
+# ==========================================
+# SYNTHETIC CATALOGUES
+# ==========================================
+class Catalogue:
+    """
+    n teams derived from the real db.json names (suffixed " 2", " 3", ...
+    once they run out), half of them listed in a TSDB league, paired into
+    n/2 sync-nodes matches shaped like the recorded fixture.
+    """
+    def __init__(self, n, seed_file=os.path.join(ROOT, "db.json")):
+        with open(seed_file, 'r') as f: seeds = json.load(f)
+        match_shape = load_fixture("sync_nodes.json")["matches"][0]
+        team_shape = load_fixture("search_all_teams.json")["teams"][0]
+        leagues = list(LEAGUES.items())
+
+        self.n = n
+        self.teams = []
+        for i in range(n):
+            seed = seeds[i % len(seeds)]
+            rnd = i // len(seeds)
+            name = seed["Team"] if rnd == 0 else f"{seed['Team']} {rnd + 1}"
+            league = leagues[(i // 2) % len(leagues)] if i % 2 == 0 else None
+            self.teams.append({"Team": name, "Sport": seed["Sport"], "slug": slugify(name), "tsdb": league})
+
+        self._match_shape = match_shape
+        self._team_shape = team_shape
+        self.matches = []
+        self.tsdb_teams = {}
+
+    def bind(self, badge_url):
+        """Builds the payloads once the stub server's badge URL is known."""
+        self.matches = []
+        for i in range(0, len(self.teams) - 1, 2):
+            a, b = self.teams[i], self.teams[i + 1]
+            m = dict(self._match_shape)
+            m.update({
+                "id": f"{a['slug']}-vs-{b['slug']}-{i}",
+                "title": f"{a['Team']} vs {b['Team']}",
+                "sport": a["Sport"],
+                "team_a": a["Team"], "team_b": b["Team"],
+                "team_a_logo": f"{badge_url}/badge/{a['slug']}.webp",
+                "team_b_logo": f"{badge_url}/badge/{b['slug']}.webp",
+            })
+            self.matches.append(m)
+
+        self.tsdb_teams = {}
+        for i, t in enumerate(self.teams):
+            if not t["tsdb"]: continue
+            display, tsdb_name = t["tsdb"]
+            rec = dict(self._team_shape)
+            rec.update({
+                "idTeam": str(100000 + i), "strTeam": t["Team"], "strLeague": tsdb_name,
+                "strBadge": f"{badge_url}/tsdb-badge/{t['slug']}.png",
+            })
+            self.tsdb_teams.setdefault(tsdb_name, []).append(rec)
+
+    def db_records(self):
+        """The catalogue as a fresh db.json (every team Pending)."""
+        return [{"Team": t["Team"], "Sport": t["Sport"], "League": "", "Status": "Pending"} for t in self.teams]
+
+    def logo_slugs(self):
+        """Slugs a TSDB harvest of this catalogue would leave on disk."""
+        return [t["slug"] for t in self.teams if t["tsdb"]]
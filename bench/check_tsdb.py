@@ -0,0 +1,118 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+# ==========================================
+# OFFLINE CHECK: fetch_tsdb against the stub server
+# ==========================================
+# python bench/check_tsdb.py [--teams 24]
+# Harvests a small catalogue and checks the league map, the stored badges
+# and the per-host limits. Exits 1 on any failure.
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH)
+
+from stubs import StubServer
+from catalogue import Catalogue
+
+from badge_cache import BadgeManifest
+from asset_store import AssetStore
+import fetch_tsdb
+
+TEAMS = 24              # Half of them in a TSDB league, one per league
+LEAGUE_WORKERS = 4
+DOWNLOAD_WORKERS = 4
+API_RATE = 10.0         # Below what the league pool could do: the limiter must bind
+BADGE_RATE = 100.0      # Above what the download pool can do: the pool must bind
+BADGE_DELAY = 1.0       # Seconds per badge answer, so downloads overlap
+RATE_SLACK = 0.05       # Seconds of scheduling jitter allowed per request
+
+def over_rate(times, rate):
+    """Most requests in any window beyond what rate allows (<= 0 if the rate held)."""
+    worst = float('-inf')
+    for i in range(len(times)):
+        for j in range(i + 1, len(times)):
+            worst = max(worst, (j - i) - rate * (times[j] - times[i] + RATE_SLACK) - 1)
+    return worst
+
+def harvest(store):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fetch_tsdb.harvest(BadgeManifest(path="scripts/badge_manifest.json"), store)
+
+def check(cat, server):
+    """Returns a list of failures; empty if fetch_tsdb behaved."""
+    failures = []
+    store = AssetStore()
+    league_map = harvest(store)
+
+    # 1. League map: every catalogue team in a TSDB league, and nothing else
+    expected = {t["slug"]: t["tsdb"][0] for t in cat.teams if t["tsdb"]}
+    if league_map != expected:
+        wrong = sorted(set(league_map.items()) ^ set(expected.items()))
+        failures.append(f"league_map differs: {wrong[:5]}")
+
+    # 2. Badges: one stored logo (every variant) per slug, files on disk exactly those indexed
+    slugs = store.slugs(fetch_tsdb.SAVE_DIR)
+    if slugs != sorted(cat.logo_slugs()):
+        failures.append(f"stored slugs {slugs} != catalogue {sorted(cat.logo_slugs())}")
+    partial = [s for s in slugs if not store.has(f"{fetch_tsdb.SAVE_DIR}/{s}.webp")]
+    if partial: failures.append(f"missing variants: {partial}")
+    on_disk = set(os.listdir(store.store_dir)) if os.path.isdir(store.store_dir) else set()
+    indexed = {f"{h}.{meta.get('ext', 'webp')}" for h, meta in store.assets.items()}
+    if on_disk != indexed:
+        failures.append(f"store files != index: {sorted(on_disk ^ indexed)[:5]}")
+    if os.path.exists(fetch_tsdb.SAVE_DIR):
+        failures.append(f"{fetch_tsdb.SAVE_DIR} written: logos belong in the store only")
+
+    # 3. Limits per host: the API limiter holds its rate, the download pool its width
+    api_host, badge_host = server.api_url.split("//")[1], server.badge_url.split("//")[1]
+    excess = over_rate(server.arrivals.get(api_host, []), API_RATE)
+    if excess > 0: failures.append(f"API rate exceeded {API_RATE}/s by {excess:.1f} requests")
+    if server.peak.get(api_host, 0) > LEAGUE_WORKERS:
+        failures.append(f"{server.peak[api_host]} league queries at once > {LEAGUE_WORKERS}")
+    if not 1 < server.peak.get(badge_host, 0) <= DOWNLOAD_WORKERS:
+        failures.append(f"{server.peak.get(badge_host, 0)} badge downloads at once, expected 2..{DOWNLOAD_WORKERS}")
+
+    # 4. A second run has every badge already: no badge requests at all
+    store.save()
+    before = len(server.arrivals.get(badge_host, []))
+    harvest(AssetStore())
+    again = len(server.arrivals.get(badge_host, [])) - before
+    if again: failures.append(f"second run re-downloaded {again} badges")
+
+    print(f"   league_map {len(league_map)} teams, {len(slugs)} logos, {len(indexed)} stored files")
+    print(f"   peaks: {server.peak.get(api_host, 0)} league queries, {server.peak.get(badge_host, 0)} badge downloads")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="fetch_tsdb against the offline stub server")
+    parser.add_argument("--teams", type=int, default=TEAMS)
+    args = parser.parse_args()
+
+    fetch_tsdb.LEAGUE_WORKERS, fetch_tsdb.DOWNLOAD_WORKERS = LEAGUE_WORKERS, DOWNLOAD_WORKERS
+    fetch_tsdb.API_RATE, fetch_tsdb.BADGE_RATE = API_RATE, BADGE_RATE
+
+    cat = Catalogue(args.teams)
+    server = StubServer(cat, badge_delay=BADGE_DELAY).start()
+    fetch_tsdb.BASE_URL = f"{server.api_url}/api/v1/json/123"
+    scratch = tempfile.mkdtemp(prefix="leagues-check-tsdb-")
+    cwd = os.getcwd()
+    print(f"--- fetch_tsdb check: {args.teams} teams, {len(cat.logo_slugs())} TSDB badges ---")
+    try:
+        os.chdir(scratch)
+        failures = check(cat, server)
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    for problem in failures:
+        print(f"   FAILED: {problem}")
+    print(f"--- {'FAILED' if failures else 'OK'} ---")
+    if failures: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
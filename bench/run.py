@@ -0,0 +1,231 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# ==========================================
+# OFFLINE BENCHMARK SUITE
+# ==========================================
+# python bench/run.py [--sizes 1000,10000,100000] [--only e2e,badges,matching,db]
+#                     [--compare bench/results/<old>.json]
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+sys.path.insert(0, BENCH)
+
+from stubs import StubServer, install_fake_genai
+from catalogue import Catalogue
+
+install_fake_genai()   # Before any script module imports google.genai
+
+from net import make_session
+from badge_cache import BadgeManifest, save_image_optimized
+from asset_store import AssetStore
+from team_store import TeamStore
+import fetch_teams
+import generate_map
+
+SIZES = [1000, 10000, 100000]
+E2E_MAX = 1000          # End-to-end runs download and encode every badge: keep them small
+BADGE_SAMPLE = 50       # save_image_optimized calls per size
+RESULTS_DIR = os.path.join(BENCH, "results")
+
+# Run in order in one workspace, like the scheduled workflow
+E2E_CHAIN = [
+    ("fetch_teams", "scripts/fetch_teams.py"),
+    ("fill_leagues", "scripts/fill_leagues.py"),
+    ("verify_leagues", "scripts/verify_leagues.py"),
+    ("fetch_tsdb", "scripts/fetch_tsdb.py"),
+    ("fetch_streamed", "scripts/fetch_streamed.py"),
+    ("generate_map", "scripts/generate_map.py"),
+]
+# Each from a fresh workspace
+E2E_FRESH = [
+    ("pipeline", "scripts/pipeline.py"),
+    ("main", "main.py"),
+]
+
+# Statuses a run must leave in db.json: a broken fake client fails, not times
+E2E_EXPECT = {
+    "fill_leagues": ["AI_Filled"],
+    "verify_leagues": ["Modified"],
+    "pipeline": ["AI_Filled", "Modified"],
+    "main": ["AI_Filled", "Verified_Modified"],
+}
+
+def make_workspace(root):
+    """Empty db.json, no logos and settings with bench keys."""
+    os.makedirs(os.path.join(root, "assets/data"), exist_ok=True)
+    os.makedirs(os.path.join(root, "scripts"), exist_ok=True)
+    with open(os.path.join(ROOT, "settings.json"), 'r') as f: settings = json.load(f)
+    settings.update({"extraction_key": "bench", "verification_key": "bench", "enable_verification": True})
+    with open(os.path.join(root, "settings.json"), 'w') as f: json.dump(settings, f)
+    with open(os.path.join(root, "db.json"), 'w') as f: json.dump([], f)
+    return root
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = fn(*args)
+    return time.perf_counter() - start, value
+
+def entry(seconds, items):
+    return {"seconds": round(seconds, 4), "items": items,
+            "per_item_ms": round(1000 * seconds / items, 4) if items else None}
+
+# ---------- End to end ----------
+def run_script(workspace, script, env):
+    start = time.perf_counter()
+    with open(os.path.join(workspace, "bench.log"), 'a') as log:
+        code = subprocess.call([sys.executable, os.path.join(BENCH, "run_script.py"), workspace,
+                                os.path.join(ROOT, script)], stdout=log, stderr=subprocess.STDOUT,
+                               env={**os.environ, **env, "RUN_REPORT_DIR": os.path.join(workspace, "reports")})
+    return time.perf_counter() - start, code
+
+def missing_statuses(workspace, name):
+    """Expected statuses (E2E_EXPECT) no db.json record has after the run."""
+    try:
+        with open(os.path.join(workspace, "db.json"), 'r') as f: records = json.load(f)
+    except (OSError, ValueError):
+        records = []
+    found = {rec.get("Status") for rec in records}
+    return [status for status in E2E_EXPECT.get(name, []) if status not in found]
+
+def e2e_entry(workspace, name, seconds, code, n):
+    result = dict(entry(seconds, n), exit=code)
+    missing = missing_statuses(workspace, name)
+    if missing: result["error"] = f"no {', '.join(missing)} records"
+    return result
+
+def bench_e2e(cat, server, scratch):
+    results = {}
+    chain = make_workspace(os.path.join(scratch, "chain"))
+    for name, script in E2E_CHAIN:
+        seconds, code = run_script(chain, script, server.env())
+        results[f"e2e.{name}"] = e2e_entry(chain, name, seconds, code, cat.n)
+    for name, script in E2E_FRESH:
+        ws = make_workspace(os.path.join(scratch, name))
+        seconds, code = run_script(ws, script, server.env())
+        results[f"e2e.{name}"] = e2e_entry(ws, name, seconds, code, cat.n)
+    return results
+
+# ---------- Hot functions ----------
+def bench_badges(cat, server, scratch, sample):
+    os.chdir(make_workspace(os.path.join(scratch, "badges")))
+    session = make_session()
+    manifest = BadgeManifest(path="scripts/badge_manifest.json")
+    store = AssetStore()
+    teams = cat.teams[:sample]
+
+    def run():
+        for t in teams:
+            save_image_optimized(f"{server.badge_url}/badge/{t['slug']}.webp",
+                                 f"assets/logos/streamed/{t['slug']}.webp", session, manifest, store)
+    seconds, _ = timed(run)
+    return {"save_image_optimized": entry(seconds, len(teams))}
+
+def build_logos(paths):
+    logos = generate_map.LogoIndex(paths)
+    logos.matcher   # Built lazily: include it in the index timing
+    return logos
+
+def bench_matching(cat):
+    paths = {f"/assets/logos/tsdb/{slug}.webp": slug for slug in cat.logo_slugs()}
+    build, logos = timed(build_logos, paths)
+
+    def run():
+        return sum(1 for t in cat.teams if generate_map.match_team(t["Team"], t["Sport"], logos)['path'])
+    seconds, found = timed(run)
+    return {"match.index": entry(build, len(paths)),
+            "match.teams": dict(entry(seconds, cat.n), matched=found)}
+
+def bench_db(cat, scratch):
+    ws = make_workspace(os.path.join(scratch, "db"))
+    db_json = os.path.join(ws, "db.json")
+    store = TeamStore(path=os.path.join(ws, "merge.sqlite"), json_path=db_json)
+    merge, added = timed(fetch_teams.sync_teams, store, cat.matches)
+    export, _ = timed(store.export)
+    store.close()
+    load, fresh = timed(TeamStore, os.path.join(ws, "import.sqlite"), db_json)
+    fresh.close()
+    return {"db.sync_teams": dict(entry(merge, cat.n), added=added),
+            "db.export": entry(export, cat.n),
+            "db.import": entry(load, cat.n)}
+
+# ---------- Results ----------
+def environment():
+    try:
+        commit = subprocess.check_output(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+def compare(results, old_path):
+    with open(old_path, 'r') as f: old = json.load(f)["results"]
+    print(f"--- Compared with {old_path} (new / old seconds) ---")
+    for bench, sizes in results.items():
+        for size, new in sizes.items():
+            prev = old.get(bench, {}).get(size)
+            if prev and prev.get("seconds"):
+                print(f"   {bench:<24} {size:>7}  {new['seconds'] / prev['seconds']:6.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks on synthetic catalogues")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--only", default="e2e,badges,matching,db")
+    parser.add_argument("--e2e-max", type=int, default=E2E_MAX)
+    parser.add_argument("--badge-sample", type=int, default=BADGE_SAMPLE)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = set(args.only.split(","))
+    results = {}
+    cwd = os.getcwd()
+
+    for n in sizes:
+        cat = Catalogue(n)
+        server = StubServer(cat).start()
+        scratch = tempfile.mkdtemp(prefix=f"leagues-bench-{n}-")
+        print(f"--- Catalogue: {n} teams, {len(cat.matches)} matches ---")
+        try:
+            found = {}
+            if "db" in only: found.update(bench_db(cat, scratch))
+            if "matching" in only: found.update(bench_matching(cat))
+            if "badges" in only: found.update(bench_badges(cat, server, scratch, args.badge_sample))
+            if "e2e" in only and n <= args.e2e_max: found.update(bench_e2e(cat, server, scratch))
+        finally:
+            os.chdir(cwd)
+            server.stop()
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        for bench, data in found.items():
+            results.setdefault(bench, {})[str(n)] = data
+            problem = data.get("error") or (f"exit {data['exit']}" if data.get("exit") else "")
+            print(f"   {bench:<24} {data['seconds']:9.3f}s  {data['per_item_ms'] or 0:9.3f} ms/item"
+                  f"{'  FAILED: ' + problem if problem else ''}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({"meta": environment(), "sizes": sizes, "results": results}, f, indent=1, sort_keys=True)
+    print(f"--- Results: {out} ---")
+    if args.compare: compare(results, args.compare)
+
+    failed = [f"{bench} @ {size}" for bench, sizes in results.items() for size, data in sizes.items()
+              if data.get("error") or data.get("exit")]
+    if failed:
+        print(f"--- FAILED: {', '.join(failed)} ---")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+import runpy
+import sys
+
+# ==========================================
+# SUBPROCESS BOOTSTRAP: python bench/run_script.py <workspace> <script> [args]
+# ==========================================
+# Runs one pipeline script as __main__ inside a scratch workspace, with the
+# fake google.genai installed. Each script gets a fresh interpreter so module
+# state (caches, metrics, pools) never leaks between timed runs.
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+sys.path.insert(0, BENCH)
+
+from stubs import install_fake_genai
+
+def main():
+    workspace, script = sys.argv[1], os.path.abspath(sys.argv[2])
+    install_fake_genai()
+    sys.path.insert(0, os.path.join(ROOT, "scripts"))
+    os.chdir(workspace)
+    sys.argv = [script] + sys.argv[3:]
+    runpy.run_path(script, run_name="__main__")
+
+if __name__ == "__main__":
+    main()
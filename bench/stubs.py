@@ -0,0 +1,172 @@
+import json
+import os
+import sys
+import threading
+import time
+import types
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace as NS
+
+# ==========================================
+# OFFLINE STUBS: sync-nodes, TSDB, badges, Gemini
+# ==========================================
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r') as f: return json.load(f)
+
+def load_badges():
+    folder = os.path.join(FIXTURES, "badges")
+    badges = []
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'rb') as f: badges.append(f.read())
+    return badges
+
+class StubServer:
+    """
+    Serves a catalogue (see catalogue.py) the way the live services do:
+      /api/sync-nodes                      -> {"matches": [...]}
+      /api/v1/json/<key>/search_all_teams.php?l=<league> -> {"teams": [...]}
+      /badge/<id>.webp, /tsdb-badge/<slug>.png -> fixture badge bytes
+    The API answers on 127.0.0.1 and badges on localhost, so per-host
+    rate limits apply to them separately, as with the real hosts.
+    badge_delay slows every badge answer down. Per Host header, .arrivals
+    keeps request times (monotonic) and .peak the most requests being
+    answered at once.
+    """
+    def __init__(self, catalogue, port=0, badge_delay=0.0):
+        self.catalogue = catalogue
+        self.badges = load_badges()
+        self.badge_delay = badge_delay
+        self.requests = 0
+        self.arrivals = {}
+        self.peak = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.port = self.httpd.server_address[1]
+        self.api_url = f"http://127.0.0.1:{self.port}"
+        self.badge_url = f"http://localhost:{self.port}"
+        catalogue.bind(self.badge_url)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            def log_message(self, *args): pass
+
+            def do_GET(self):
+                host = self.headers.get('Host', '')
+                with server._lock:
+                    server.requests += 1
+                    server.arrivals.setdefault(host, []).append(time.monotonic())
+                    server._in_flight[host] = server._in_flight.get(host, 0) + 1
+                    server.peak[host] = max(server.peak.get(host, 0), server._in_flight[host])
+                try:
+                    self._answer()
+                finally:
+                    with server._lock: server._in_flight[host] -= 1
+
+            def _answer(self):
+                url = urllib.parse.urlparse(self.path)
+                if url.path.endswith('/sync-nodes'):
+                    self._send(json.dumps({"matches": server.catalogue.matches}).encode(), 'application/json')
+                elif url.path.endswith('/search_all_teams.php'):
+                    league = urllib.parse.parse_qs(url.query).get('l', [''])[0]
+                    teams = server.catalogue.tsdb_teams.get(league) or None
+                    self._send(json.dumps({"teams": teams}).encode(), 'application/json')
+                elif url.path.startswith(('/badge/', '/tsdb-badge/')):
+                    if server.badge_delay: time.sleep(server.badge_delay)
+                    key = os.path.basename(url.path)
+                    self._send(server.badges[sum(key.encode()) % len(server.badges)], 'image/png')
+                else:
+                    self._send(b'', 'text/plain', 404)
+
+            def _send(self, body, content_type, status=200):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def env(self):
+        """Environment that points every script at this server."""
+        return {
+            "SYNC_NODES_URL": f"{self.api_url}/api/sync-nodes",
+            "TSDB_BASE_URL": f"{self.api_url}/api/v1/json/123",
+            "STREAMED_BASE_URL": f"{self.badge_url}/badge/",
+            "GEMINI_KEY_EXTRACTION": "bench",
+            "GEMINI_KEY_VERIFICATION": "bench",
+        }
+
+# ---------- Fake google.genai ----------
+def _response(text):
+    part = NS(text=text)
+    return NS(text=text, candidates=[NS(content=NS(parts=[part]))])
+
+class FakeModels:
+    """
+    Canned replies from genai_replies.json, read off the id table the
+    prompt packer renders: fill prompts get a league per sport,
+    verification prompts get a correction for every row of a sport listed
+    under "verify" whose League differs. Streamed replies arrive in
+    chunk_size pieces.
+    """
+    def __init__(self, replies, latency=0.0, chunk_size=64):
+        self.replies = replies
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def _rows(self, contents):
+        """[{column: value}] from the '["id",...]' header and the rows after it."""
+        lines = contents[contents.rindex('["id"'):].splitlines()
+        columns = json.loads(lines[0])
+        return [dict(zip(columns, json.loads(line))) for line in lines[1:] if line.strip()]
+
+    def _answer(self, contents):
+        self.calls += 1
+        if self.latency: time.sleep(self.latency)
+        rows = self._rows(contents)
+        if rows and "League" in rows[0]:
+            fixes = self.replies.get("verify", {})
+            answer = [{"id": r["id"], "League": fixes[r["Sport"]]} for r in rows
+                      if r["Sport"] in fixes and r["League"] != fixes[r["Sport"]]]
+            return json.dumps(answer)
+        fill = self.replies.get("fill", {})
+        default = self.replies.get("fill_default", "Unknown")
+        answer = [{"id": r["id"], "League": fill.get(r["Sport"], default)} for r in rows]
+        return "```json\n" + json.dumps(answer) + "\n```"
+
+    def generate_content(self, model, contents):
+        return _response(self._answer(contents))
+
+    def generate_content_stream(self, model, contents):
+        text = self._answer(contents)
+        for i in range(0, len(text), self.chunk_size):
+            yield _response(text[i:i + self.chunk_size])
+
+def install_fake_genai(latency=None):
+    """Registers a fake google.genai module; must run before scripts import it."""
+    replies = load_fixture("genai_replies.json")
+    latency = float(os.environ.get("BENCH_GENAI_LATENCY", "0")) if latency is None else latency
+
+    genai = types.ModuleType("google.genai")
+    genai.Client = lambda api_key=None, **kw: NS(models=FakeModels(replies, latency))
+    google = types.ModuleType("google")
+    google.genai = genai
+    sys.modules["google"] = google
+    sys.modules["google.genai"] = genai
+    return genai
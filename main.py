@@ -1,21 +1,27 @@
 import json
-import requests
 from google import genai
-import time
-import re
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from team_store import TeamStore
+from snapshot import iter_feed, refresh_requested, FeedUnavailable
+from fill_engine import fill_leagues, FILL_COLUMNS
+from verify_leagues import VERIFY_COLUMNS
+from prompt_packer import from_settings
+from model_output import parse_objects
+from league_resolver import resolve_pending
+from ai_cache import AICache, partition
+from model_registry import ModelSelector, generate
+import metrics
 
 # ==========================================================
 # CONFIGURATION
 # ==========================================================
-FILL_LIMIT = 50
-BATCH_SIZE = 30
+FILL_LIMIT = 200
+FILL_WORKERS = 4
 SLEEP_TIME = 5
 
-# IMPORTANT: use the FAST backend path
-BACKEND_URL = "https://vercelapi-olive.vercel.app/api/sync-nodes?country=us"
-BACKEND_TIMEOUT = 15  # HARD STOP (never hang)
-
 # ==========================================================
 # LOAD SETTINGS
 # ==========================================================
@@ -28,17 +34,12 @@ except Exception:
 
 KEY_FILL = config.get("extraction_key")
 KEY_VERIFY = config.get("verification_key")
-PROMPT_FILL = config.get("extraction_prompt")
 PROMPT_VERIFY = config.get("verification_prompt")
 ENABLE_VERIFICATION = config.get("enable_verification", False)
 
-# ==========================================================
-# HEADERS
-# ==========================================================
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-    "Accept": "application/json"
-}
+# Rows per prompt follow input/output_token_budget
+FILL_PACKER = from_settings(config, "extraction_prompt", FILL_COLUMNS)
+VERIFY_PACKER = from_settings(config, "verification_prompt", VERIFY_COLUMNS)
 
 # ==========================================================
 # GEMINI CLIENTS (CREATE ONCE)
@@ -46,118 +47,80 @@ HEADERS = {
 FILL_CLIENT = genai.Client(api_key=KEY_FILL) if KEY_FILL else None
 VERIFY_CLIENT = genai.Client(api_key=KEY_VERIFY) if KEY_VERIFY else None
 
-# ==========================================================
-# UTILS
-# ==========================================================
-def norm(name):
-    return name.strip().lower() if name else ""
-
-def safe_json_extract(text):
-    match = re.search(r"\[.*\]", text, re.DOTALL)
-    if not match:
-        return []
-    try:
-        return json.loads(match.group())
-    except Exception:
-        return []
+# Remembered working model per key; 404s fall through to the next one
+FILL_MODELS = ModelSelector(KEY_FILL) if KEY_FILL else None
+VERIFY_MODELS = ModelSelector(KEY_VERIFY) if KEY_VERIFY else None
 
 # ==========================================================
 # AI HELPERS
 # ==========================================================
-def ask_ai_fill(team, sport):
-    if not FILL_CLIENT:
+def ask_ai_verify_batch(batch):
+    """
+    Returns (corrections, clean, model), or None if the request failed.
+    Malformed corrections are dropped, not the whole reply; clean is False
+    then. model is the one that answered (a 404 moves on to the next).
+    """
+    if not VERIFY_CLIENT:
         return None
     try:
-        prompt = PROMPT_FILL.format(team=team, sport=sport)
-        r = FILL_CLIENT.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt
-        )
-        return r.text.strip()
+        prompt = VERIFY_PACKER.render(batch)
+        r, model = generate(VERIFY_CLIENT, VERIFY_MODELS, prompt)
+        corrections, reply = parse_objects(r.text)
+        return corrections, reply.clean, model
     except Exception:
         return None
 
-def ask_ai_verify_batch(batch_data):
-    if not VERIFY_CLIENT:
-        return []
-    try:
-        prompt = PROMPT_VERIFY.replace("{batch_data}", json.dumps(batch_data))
-        r = VERIFY_CLIENT.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt
-        )
-        return safe_json_extract(r.text)
-    except Exception:
-        return []
-
 # ==========================================================
 # MAIN
 # ==========================================================
 def main():
     # ------------------------------------------------------
-    # LOAD DB
+    # LOAD DB (indexed store, synced from db.json)
     # ------------------------------------------------------
-    try:
-        with open("db.json", "r") as f:
-            db = json.load(f)
-    except Exception:
-        db = []
-
-    existing = {norm(t["Team"]): t for t in db}
-    changes_made = False
+    store = TeamStore()
 
     # ------------------------------------------------------
-    # PHASE 1 — FAST BACKEND SYNC (NON-BLOCKING)
+    # PHASE 1 — FAST BACKEND SYNC (SHARED SNAPSHOT)
     # ------------------------------------------------------
     print("🌍 Phase 1: Syncing from Backend...")
+    # Matches from every country feed are processed as they stream in
     try:
-        resp = requests.get(BACKEND_URL, headers=HEADERS, timeout=BACKEND_TIMEOUT)
-        resp.raise_for_status()
-        matches = resp.json().get("matches", [])
-    except Exception as e:
-        print(f"⚠️ Backend skipped: {e}")
-        matches = []
-
-    for m in matches:
-        sport = m.get("sport") or "Unknown"
-        for key in ("team_a", "team_b"):
-            name = m.get(key)
-            n = norm(name)
-            if name and n not in existing:
-                print(f"   🆕 New team: {name}")
-                rec = {
+        for m in iter_feed(refresh=refresh_requested()):
+            sport = m.get("sport") or "Unknown"
+            for key in ("team_a", "team_b"):
+                name = m.get(key)
+                if not name: continue
+                record = {
                     "Team": name,
                     "Sport": sport,
                     "League": "",
                     "Status": "Pending"
                 }
-                db.append(rec)
-                existing[n] = rec
-                changes_made = True
+                if m.get("region"): record["Region"] = m["region"]
+                if store.add(record):
+                    print(f"   🆕 New team: {name}")
+    except FeedUnavailable:
+        print("⚠️ Backend skipped: no backend and no snapshot")
 
     # ------------------------------------------------------
     # PHASE 2 — FILL LEAGUES
     # ------------------------------------------------------
     print(f"\n🤖 Phase 2: Filling leagues (limit {FILL_LIMIT})")
-    filled = 0
-
-    for t in db:
-        if filled >= FILL_LIMIT:
-            break
-        if t["League"]:
-            continue
-        if not KEY_FILL:
-            break
-
-        print(f"   ✏️ {t['Team']}")
-        league = ask_ai_fill(t["Team"], t["Sport"])
-        time.sleep(SLEEP_TIME)
-
-        if league:
-            t["League"] = league
-            t["Status"] = "AI_Filled"
-            filled += 1
-            changes_made = True
+    filled = resolve_pending(store)
+    if filled:
+        print(f"   📚 Resolved {filled} teams without AI")
+
+    if FILL_CLIENT:
+        fill_cache = AICache("fill")
+        stats = fill_leagues(
+            store, FILL_CLIENT, FILL_MODELS, FILL_PACKER,
+            limit=FILL_LIMIT, workers=FILL_WORKERS,
+            cache=fill_cache
+        )
+        filled += stats["filled"]
+        print(f"   ✏️ Filled {stats['filled']} teams in {stats['requests']} requests")
+        fill_cache.evict()
+        print(f"   🗃️ {fill_cache.summary()}")
 
     if filled == 0:
         print("   ✅ Nothing to fill")
@@ -167,40 +130,58 @@ def main():
     # ------------------------------------------------------
     if ENABLE_VERIFICATION and KEY_VERIFY:
         print(f"\n🕵️ Phase 3: Verification")
-        to_check = [
-            t for t in db
+        verify_cache = AICache("verify")
+        payload = [
+            {"Team": t["Team"], "League": t["League"], "Sport": t["Sport"]}
+            for t in store.all()
             if t["League"] and t["League"] != "Unknown"
         ]
 
-        for i in range(0, len(to_check), BATCH_SIZE):
-            batch = to_check[i:i + BATCH_SIZE]
-            payload = [
-                {"Team": t["Team"], "League": t["League"], "Sport": t["Sport"]}
-                for t in batch
-            ]
-
-            fixes = ask_ai_verify_batch(payload)
-            time.sleep(SLEEP_TIME)
-
-            for f in fixes:
-                n = norm(f.get("Team"))
-                if n in existing:
-                    rec = existing[n]
-                    if rec["League"] != f["League"]:
-                        print(f"   ⚠️ Fix: {rec['Team']} → {f['League']}")
-                        rec["League"] = f["League"]
-                        rec["Status"] = "Verified_Modified"
-                        changes_made = True
+        # Unchanged records already audited are answered from cache
+        model = VERIFY_MODELS.model
+        cached, payload = partition(verify_cache, model, PROMPT_VERIFY, payload)
+        fixes = [(item, league) for item, league in cached if league]
+
+        # The rest in as few prompts as the token budgets allow
+        batches = VERIFY_PACKER.pack(payload)
+        while batches:
+            batch = batches.pop(0)
+            answer = ask_ai_verify_batch(batch)
+            metrics.sleep(SLEEP_TIME)
+            if answer is None: continue
+            corrections, clean, used = answer
+            by_row = VERIFY_PACKER.match(batch, corrections)
+            for row, item in enumerate(batch):
+                # Unlisted rows only count as confirmed if the reply was intact
+                if row not in by_row and not clean: continue
+                league = by_row.get(row, {}).get("League")
+                verify_cache.put(used, PROMPT_VERIFY, item, league)
+                if league: fixes.append((item, league))
+
+            # A 404 moved on to another model: its cache may answer the rest
+            if used != model:
+                model = used
+                cached, rest = partition(verify_cache, model, PROMPT_VERIFY, [item for b in batches for item in b])
+                fixes += [(item, league) for item, league in cached if league]
+                batches = VERIFY_PACKER.pack(rest)
+
+        for item, league in fixes:
+            rec = store.get(item["Team"], item["Sport"])
+            if rec and rec["League"] != league:
+                print(f"   ⚠️ Fix: {rec['Team']} → {league}")
+                store.update(rec["Team"], rec["Sport"], League=league, Status="Verified_Modified")
+
+        verify_cache.evict()
+        print(f"   🗃️ {verify_cache.summary()}")
 
     # ------------------------------------------------------
     # SAVE
     # ------------------------------------------------------
-    if changes_made:
-        with open("db.json", "w") as f:
-            json.dump(db, f, indent=4)
+    if store.export():
         print("\n💾 Database updated")
     else:
         print("\n💤 No changes")
 
 if __name__ == "__main__":
-    main()
+    with metrics.run("main"):
+        main()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# ==========================================
+# CONTENT-ADDRESSED MODEL RESPONSE CACHE
+# ==========================================
+CACHE_DIR = "scripts/.cache/ai"
+CACHE_TTL = 30 * 24 * 3600      # Seconds before an answer is asked again
+CACHE_MAX_BYTES = 20 * 1024 * 1024
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def normalize_payload(payload):
+    """Case/whitespace-insensitive, key-order-insensitive form of a payload."""
+    if isinstance(payload, dict):
+        return {k: normalize_payload(v) for k, v in sorted(payload.items())}
+    if isinstance(payload, list):
+        return [normalize_payload(v) for v in payload]
+    if isinstance(payload, str):
+        return " ".join(payload.split()).lower()
+    return payload
+
+class AICache:
+    """
+    One JSON file per answer, named by sha256(model, prompt template hash,
+    normalized payload). Entries expire after ttl; the oldest entries are
+    dropped once the directory grows past max_bytes.
+
+    get() returns (hit, value) because a cached value may be None
+    (e.g. "verified, no correction").
+    """
+    def __init__(self, namespace, root=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.dir = os.path.join(root, namespace)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def key(self, model, template, payload):
+        blob = json.dumps([model, _digest(template or ""), normalize_payload(payload)],
+                          sort_keys=True, ensure_ascii=False)
+        return _digest(blob)
+
+    def _path(self, key):
+        return os.path.join(self.dir, key[:2], f"{key}.json")
+
+    def get(self, model, template, payload):
+        path = self._path(self.key(model, template, payload))
+        try:
+            if time.time() - os.path.getmtime(path) < self.ttl:
+                with metrics.timed("json_io"), open(path, 'r') as f: value = json.load(f)['value']
+                with self._lock: self.hits += 1
+                return True, value
+        except (OSError, ValueError, KeyError):
+            pass
+        with self._lock: self.misses += 1
+        return False, None
+
+    def put(self, model, template, payload, value):
+        path = self._path(self.key(model, template, payload))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with metrics.timed("json_io"):
+            with open(tmp, 'w') as f:
+                json.dump({'model': model, 'value': value}, f)
+            os.replace(tmp, path)
+        with self._lock: self.writes += 1
+
+    def evict(self):
+        """Drops expired entries, then oldest-first until under max_bytes."""
+        entries, total, now = [], 0, time.time()
+        for root, _, files in os.walk(self.dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try: st = os.stat(path)
+                except OSError: continue
+                if now - st.st_mtime >= self.ttl:
+                    os.remove(path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            os.remove(path)
+            total -= size
+
+    def summary(self):
+        looked_up = self.hits + self.misses
+        rate = 100 * self.hits / looked_up if looked_up else 0
+        return f"cache hits {self.hits}, misses {self.misses} ({rate:.0f}% served without a request)"
+
+def partition(cache, model, template, items):
+    """Splits payload items into ([(item, cached_value)], [uncached items])."""
+    hits, misses = [], []
+    for item in items:
+        hit, value = cache.get(model, template, item)
+        if hit: hits.append((item, value))
+        else: misses.append(item)
+    return hits, misses
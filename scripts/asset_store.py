@@ -0,0 +1,222 @@
+import hashlib
+import os
+import threading
+from collections import defaultdict
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageStat
+
+from images import LOGO_SIZE, VARIANTS, variant_key, write_file
+import metrics
+from persist import read_json, write_json
+
+# ==========================================
+# CONTENT-ADDRESSED LOGO STORE
+# ==========================================
+STORE_DIR = "assets/logos/h"
+INDEX_FILE = "assets/data/logo_index.json"
+LEGACY_DIRS = ["assets/logos/tsdb", "assets/logos/streamed"]   # Pre-store slug folders, priority order
+
+HASH_LEN = 16          # Hex chars of sha256 used in file names
+DHASH_DISTANCE = 4     # Max differing bits for a near-duplicate candidate
+PIXEL_DISTANCE = 8.0   # Max mean abs RGB difference (0-255) on 32x32 thumbs
+BANDS = 8              # dHash split into 8 x 8-bit bands for candidate lookup
+INDEX_VERSION = 3      # 3: logical paths, variants per primary. Older indexes are rebuilt by migrate()
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LEN]
+
+def _flatten(img, size):
+    """RGBA on white, resized: transparency never hides a difference."""
+    img = img.convert('RGBA')
+    bg = Image.new('RGBA', img.size, (255, 255, 255, 255))
+    bg.alpha_composite(img)
+    return bg.convert('RGB').resize(size, Image.Resampling.LANCZOS)
+
+def dhash(img):
+    """64-bit difference hash as 16 hex chars."""
+    px = _flatten(img, (9, 8)).convert('L').tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+class AssetStore:
+    """
+    The published logos: every file stored once under STORE_DIR as
+    <sha256[:16]>.<ext>, indexed in INDEX_FILE. This is the only copy.
+
+    Harvesters address logos by logical path ("assets/logos/tsdb/x.webp");
+    no file lives there. The index maps each path to the hash of its
+    primary logo, and each primary to its size/format variants.
+    Byte-identical logos share one hash. A near-identical primary (close
+    dHash, confirmed by a pixel diff) aliases the first copy seen: its
+    bytes are never stored and it is served that copy's variants.
+    Thread-safe; save() once at the end of a run.
+    """
+    def __init__(self, store_dir=STORE_DIR, index_file=INDEX_FILE):
+        self.store_dir = store_dir
+        self.index_file = index_file
+        self.aliases = {}      # logical path -> primary hash
+        self.assets = {}       # primary hash -> {"dhash", "variants": {"120.avif": hash}}; variant hash -> {"ext"}
+        self.redirects = {}    # near-duplicate hash -> canonical hash
+        self._lock = threading.RLock()
+        data = read_json(index_file, {})
+        if data.get('version') == INDEX_VERSION:
+            self.aliases = data.get('aliases', {})
+            self.assets = data.get('assets', {})
+            self.redirects = data.get('redirects', {})
+        self._bands = defaultdict(set)
+        for h, meta in self.assets.items():
+            if 'dhash' in meta: self._band_add(h, meta['dhash'])
+
+    def _band_keys(self, dh):
+        return [(i, dh[i * 2:i * 2 + 2]) for i in range(BANDS)]
+
+    def _band_add(self, h, dh):
+        for key in self._band_keys(dh):
+            self._bands[key].add(h)
+
+    def _file(self, h):
+        return os.path.join(self.store_dir, f"{h}.{self.assets[h].get('ext', 'webp')}")
+
+    def _thumb(self, h):
+        with Image.open(self._file(h)) as img:
+            return _flatten(img, (32, 32))
+
+    def _near_duplicate(self, img, dh):
+        candidates = set()
+        for key in self._band_keys(dh):
+            candidates |= self._bands.get(key, set())
+        thumb = None
+        for h in sorted(candidates, key=lambda c: hamming(dh, self.assets[c]['dhash'])):
+            if hamming(dh, self.assets[h]['dhash']) > DHASH_DISTANCE: break
+            thumb = thumb or _flatten(img, (32, 32))
+            diff = ImageStat.Stat(ImageChops.difference(thumb, self._thumb(h))).mean
+            if sum(diff) / 3 <= PIXEL_DISTANCE: return h
+        return None
+
+    def _store(self, data, ext, meta=None):
+        h = content_hash(data)
+        if h not in self.assets:
+            write_file(os.path.join(self.store_dir, f"{h}.{ext}"), data)
+            self.assets[h] = meta or {'ext': ext}
+        return h
+
+    def _served(self, path):
+        h = self.aliases.get(path)
+        return h, dict(self.assets.get(h, {}).get('variants') or {})
+
+    def put(self, path, encoded):
+        """
+        Stores one logo's { (size, fmt): bytes }, VARIANTS[0] being the
+        primary, under logical path. Returns True if what path serves changed.
+        """
+        primary = encoded[VARIANTS[0]]
+        own = content_hash(primary)
+        with self._lock:
+            before = self._served(path)
+            h = self.redirects.get(own, own)
+            if h not in self.assets:
+                with Image.open(BytesIO(primary)) as img:
+                    img.load()
+                    dh = dhash(img)
+                    canonical = self._near_duplicate(img, dh)
+                if canonical:
+                    self.redirects[h] = canonical
+                    h = canonical
+                else:
+                    self._store(primary, 'webp', {'dhash': dh})
+                    self._band_add(h, dh)
+
+            if h == own:    # Aliases of a near-duplicate are served the canonical's variants
+                variants = {variant_key(v): self._store(data, v[1]) for v, data in encoded.items() if v != VARIANTS[0]}
+                if variants: self.assets[h]['variants'] = variants
+            self.aliases[path] = h
+            return self._served(path) != before
+
+    def has(self, path):
+        """path is stored, with every size/format variant: nothing left to download."""
+        with self._lock:
+            h, variants = self._served(path)
+            if h not in self.assets: return False
+            return all(variant_key(v) in variants for v in VARIANTS[1:]) and os.path.exists(self._file(h))
+
+    def slugs(self, folder):
+        """Slugs stored under a logical folder ("assets/logos/tsdb"), sorted."""
+        prefix = folder.rstrip('/') + '/'
+        with self._lock:
+            return [p[len(prefix):-5] for p in sorted(self.aliases) if p.startswith(prefix) and p.endswith('.webp')]
+
+    def url(self, path):
+        """Hash-addressed URL for a logical path like "/assets/logos/tsdb/x.webp"; None if not stored."""
+        h = self.aliases.get(path.lstrip('/'))
+        return f"/{self.store_dir}/{h}.webp" if h in self.assets else None
+
+    def srcset(self, path):
+        """
+        { fmt: "url 1x, url 2x, ..." } for the stored variants of a logical
+        path; {} if only the primary is stored.
+        """
+        h, variants = self._served(path.lstrip('/'))
+        if h not in self.assets: return {}
+        variants[variant_key(VARIANTS[0])] = h
+        sets = {}
+        for size, fmt in VARIANTS:
+            vh = variants.get(variant_key((size, fmt)))
+            if vh: sets.setdefault(fmt, []).append(f"/{self.store_dir}/{vh}.{fmt} {size / LOGO_SIZE[0]:g}x")
+        if sum(len(entries) for entries in sets.values()) < 2: return {}   # Primary only
+        return {fmt: ", ".join(entries) for fmt, entries in sets.items()}
+
+    def migrate(self, dirs=LEGACY_DIRS):
+        """
+        Imports logos from the old slug folders (x.webp, <size>/x.<fmt>)
+        under the same logical paths. Returns the number imported.
+        """
+        count = 0
+        for d in dirs:
+            if not os.path.isdir(d): continue
+            for name in sorted(os.listdir(d)):
+                if not name.endswith('.webp'): continue
+                encoded = {}
+                for size, fmt in VARIANTS:
+                    src = f"{d}/{name}" if (size, fmt) == VARIANTS[0] else f"{d}/{size}/{name[:-5]}.{fmt}"
+                    if os.path.exists(src):
+                        with open(src, 'rb') as f: encoded[(size, fmt)] = f.read()
+                self.put(f"{d}/{name}", encoded)
+                count += 1
+        return count
+
+    def gc(self):
+        """Deletes stored files no path serves."""
+        with self._lock:
+            live = set(self.aliases.values())
+            for h in list(live):
+                live.update((self.assets.get(h, {}).get('variants') or {}).values())
+            for h in list(self.assets):
+                if h not in live:
+                    try: os.remove(self._file(h))
+                    except OSError: pass
+                    del self.assets[h]
+            self.redirects = {k: v for k, v in self.redirects.items() if v in live}
+
+    def save(self):
+        with self._lock:
+            write_json(self.index_file, {'version': INDEX_VERSION, 'aliases': self.aliases, 'assets': self.assets,
+                                         'redirects': self.redirects}, indent=1, sort_keys=True)
+
+def main():
+    store = AssetStore()
+    imported = store.migrate()
+    store.gc()
+    store.save()
+    print(f"--- Asset Store: {imported} legacy logos imported, {len(store.aliases)} logos -> "
+          f"{len(store.assets)} stored files ---")
+
+if __name__ == "__main__":
+    with metrics.run("asset_store"):
+        main()
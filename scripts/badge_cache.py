@@ -0,0 +1,152 @@
+import hashlib
+import time
+
+import metrics
+from persist import JsonState
+from images import DECODE_ERRORS, encode_variants
+
+# ==========================================
+# CONDITIONAL BADGE REFRESH
+# ==========================================
+MANIFEST_FILE = "scripts/badge_manifest.json"
+FAILURES_FILE = "scripts/badge_failures.json"
+
+RECHECK_BASE = 6 * 3600         # First re-check of a failed badge after 6h...
+RECHECK_MAX = 30 * 24 * 3600    # ...doubling per failure, capped at 30 days
+RETRY_STATUSES = {408, 425, 429}  # 4xx that say "later", not "never"
+
+class BadgeUnavailable(Exception):
+    """
+    A badge that could not be fetched. permanent: the URL itself is bad
+    (4xx, not an image) and is worth a negative-cache entry; otherwise
+    (5xx) the next run simply tries again.
+    """
+    def __init__(self, reason, permanent=True):
+        super().__init__(reason)
+        self.permanent = permanent
+
+def is_permanent(error):
+    """Only bad URLs and undecodable images are negative-cached; network errors never are."""
+    return isinstance(error, BadgeUnavailable) and error.permanent
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+class BadgeManifest(JsonState):
+    """
+    Persistent { source_url: {etag, last_modified, src_hash, path} }.
+    Shared by download threads, saved once at the end of a run.
+    """
+    def __init__(self, path=MANIFEST_FILE):
+        super().__init__(path)
+
+    def get(self, url):
+        with self._lock:
+            return dict(self.entries.get(url) or {})
+
+    def put(self, url, entry):
+        with self._lock:
+            if self.entries.get(url) != entry:
+                self.entries[url] = entry
+                self.dirty = True
+
+class FailureCache(JsonState):
+    """
+    Persistent negative cache { source_url: {failures, last, next, reason} }.
+    A URL that failed is skipped until `next`; each further failure doubles
+    the wait. A success forgets the URL.
+    """
+    def __init__(self, path=FAILURES_FILE):
+        super().__init__(path)
+
+    def due(self, url, now=None):
+        with self._lock:
+            entry = self.entries.get(url)
+        return not entry or (now or time.time()) >= entry.get('next', 0)
+
+    def fail(self, url, reason, now=None):
+        now = int(now or time.time())
+        with self._lock:
+            failures = (self.entries.get(url) or {}).get('failures', 0) + 1
+            self.entries[url] = {
+                'failures': failures,
+                'last': now,
+                'next': now + min(RECHECK_MAX, RECHECK_BASE * 2 ** (failures - 1)),
+                'reason': str(reason)[:120],
+            }
+            self.dirty = True
+
+    def clear(self, url):
+        with self._lock:
+            if self.entries.pop(url, None) is not None: self.dirty = True
+
+def fetch_logo(url, save_path, session, manifest, store, refresh=False, encode=encode_variants):
+    """
+    Downloads a badge and stores its size/format variants in the asset
+    store under logical path save_path, only when the source changed.
+    encode(content) -> { (size, fmt): bytes }.
+
+    Without refresh, a logo the store already has in full is left alone
+    (no request at all). With refresh, a conditional GET is sent; 304s
+    and byte-identical sources skip decode/encode. Returns True if what
+    save_path serves changed; raises BadgeUnavailable on any other status
+    or undecodable content.
+    """
+    exists = store.has(save_path)
+    if exists and not refresh: return False
+
+    entry = manifest.get(url)
+    headers = {}
+    if exists and entry.get('path') == save_path:
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+
+    resp = session.get(url, headers=headers, timeout=10)
+    if resp.status_code == 304: return False
+    if resp.status_code != 200:
+        status = resp.status_code
+        raise BadgeUnavailable(f"HTTP {status}", permanent=400 <= status < 500 and status not in RETRY_STATUSES)
+
+    src_hash = sha256(resp.content)
+    entry.update({
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+        'path': save_path,
+    })
+    for stale in ('out_hash', 'out_hashes'): entry.pop(stale, None)   # Outputs are content-addressed now
+
+    if exists and entry.get('src_hash') == src_hash:
+        manifest.put(url, entry)
+        return False
+
+    with metrics.timed("encode") as op:
+        try:
+            encoded = encode(resp.content)
+        except DECODE_ERRORS as e:
+            raise BadgeUnavailable(f"Undecodable image: {e}") from e
+        op.nbytes = sum(len(data) for data in encoded.values())
+    entry['src_hash'] = src_hash
+    manifest.put(url, entry)
+    return store.put(save_path, encoded)
+
+def save_image_optimized(url, save_path, session, manifest, store, refresh=False, failures=None, limiter=None,
+                         encode_pool=None):
+    """
+    fetch_logo for the harvesters' download threads; False instead of an error.
+    limiter spaces requests per host; encode_pool (a process pool) runs the
+    encode. With failures, URLs that failed recently are not requested again
+    until their re-check time, and new permanent failures (4xx, not an
+    image) are recorded. Timeouts, resets, 429s and 5xx are retried next run.
+    """
+    if store.has(save_path) and not refresh: return False
+    if failures is not None and not failures.due(url): return False
+
+    try:
+        if limiter: limiter.wait(url)
+        encode = (lambda content: encode_pool.submit(encode_variants, content).result()) if encode_pool else encode_variants
+        saved = fetch_logo(url, save_path, session, manifest, store, refresh=refresh, encode=encode)
+    except Exception as e:
+        if failures is not None and is_permanent(e): failures.fail(url, e)
+        return False
+    if failures is not None: failures.clear(url)
+    return saved
@@ -0,0 +1,112 @@
+import math
+import os
+import random
+from collections import defaultdict
+from io import BytesIO
+
+from PIL import Image
+
+from images import LOGO_SIZE
+from identity import slugify, league_index
+from team_store import TeamStore
+import metrics
+from persist import atomic_write, read_json, write_json
+
+# ==========================================
+# LOGO SPRITE ATLAS BUILDER
+# ==========================================
+IMAGE_MAP_FILE = 'assets/data/image_map.json'
+LEAGUE_MAP_FILE = 'assets/data/league_map.json'
+SPRITE_DIR = 'assets/sprites'
+OUTPUT_FILE = 'assets/data/image_map_sprites.json'
+
+MIN_GROUP = 4          # Smaller groups are merged into their sport's atlas
+PAGE_FIXTURES = 100    # Benchmark: fixtures on one match-list page
+PAGE_SEED = 0          # Fixed, so the page sample is the same every run
+
+def group_teams(teams, store, league_map):
+    """team -> atlas group: League, else league_map, else Sport, else "other"."""
+    groups = {}
+    leagues = league_index(league_map)
+    for team in teams:
+        rec = store.get(team) or {}
+        league = rec.get('League')
+        if not league or league.lower() == "unknown":
+            league = leagues.get(team, rec.get('Sport'))
+        groups[team] = league or rec.get('Sport') or "other"
+
+    # Tiny leagues cost a request each: fold them into their sport
+    sizes = defaultdict(int)
+    for g in groups.values(): sizes[g] += 1
+    for team, g in groups.items():
+        if sizes[g] < MIN_GROUP:
+            groups[team] = (store.get(team) or {}).get('Sport') or "other"
+    return groups
+
+def pack_atlas(paths):
+    """Grid-packs equal-size tiles. Returns (image, {path: (x, y)})."""
+    w, h = LOGO_SIZE
+    cols = max(1, math.ceil(math.sqrt(len(paths))))
+    rows = math.ceil(len(paths) / cols)
+    atlas = Image.new('RGBA', (cols * w, rows * h), (0, 0, 0, 0))
+    coords = {}
+    for i, path in enumerate(paths):
+        with Image.open(path) as tile:
+            tile = tile.convert('RGBA')
+            if tile.size != LOGO_SIZE:
+                tile = tile.resize(LOGO_SIZE, Image.Resampling.LANCZOS)
+            x, y = (i % cols) * w, (i // cols) * h
+            atlas.paste(tile, (x, y))
+            coords[path] = (x, y)
+    return atlas, coords
+
+def main():
+    image_map = read_json(IMAGE_MAP_FILE, {}).get('teams', {})   # CorruptFile stops the run
+    league_map = read_json(LEAGUE_MAP_FILE, {})
+    store = TeamStore()
+    os.makedirs(SPRITE_DIR, exist_ok=True)
+
+    print(f"--- Sprite Builder: {len(image_map)} teams ---")
+
+    # 1. Group teams, one atlas per group
+    groups = group_teams(image_map, store, league_map)
+    members = defaultdict(list)
+    for team, g in groups.items():
+        path = image_map[team].lstrip('/')
+        if os.path.exists(path): members[g].append((team, path))
+
+    atlases, sprites = {}, {}
+    atlas_bytes = 0
+    for g, items in sorted(members.items()):
+        paths = sorted({p for _, p in items})
+        atlas, coords = pack_atlas(paths)
+        name = slugify(g) or "other"
+        out = BytesIO()
+        atlas.save(out, "WEBP", quality=90, method=6)
+        atomic_write(os.path.join(SPRITE_DIR, f"{name}.webp"), out.getvalue())
+
+        atlas_bytes += out.tell()
+        atlases[name] = {"url": f"/{SPRITE_DIR}/{name}.webp", "width": atlas.width, "height": atlas.height}
+        for team, path in items:
+            x, y = coords[path]
+            sprites[team] = {"atlas": name, "x": x, "y": y, "w": LOGO_SIZE[0], "h": LOGO_SIZE[1]}
+
+    # 2. Save
+    write_json(OUTPUT_FILE, {"atlases": atlases, "teams": sprites}, indent=2)
+
+    # 3. Benchmark vs one file per logo
+    files = {image_map[t].lstrip('/') for t in sprites}
+    file_bytes = sum(os.path.getsize(p) for p in files)
+    # A page mixes teams from every league: sample across atlases, not the first few
+    page_teams = random.Random(PAGE_SEED).sample(sorted(sprites), min(len(sprites), PAGE_FIXTURES * 2))
+    page_files = len({image_map[t] for t in page_teams})
+    page_atlases = len({sprites[t]["atlas"] for t in page_teams})
+
+    print(f"   Per-file : {len(files)} files, {file_bytes / 1024:.1f} KB")
+    print(f"   Atlases  : {len(atlases)} files, {atlas_bytes / 1024:.1f} KB")
+    print(f"   {PAGE_FIXTURES}-fixture page: {page_files} requests -> {page_atlases} requests")
+    print(f"--- Sprite Map Saved ({len(sprites)} teams, {len(atlases)} atlases) ---")
+
+if __name__ == "__main__":
+    with metrics.run("build_sprites"):
+        main()
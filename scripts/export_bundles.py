@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None   # .br siblings are skipped without it
+
+import metrics
+from persist import CorruptFile, atomic_write, locked, read_json
+from identity import LEAGUE_SPORTS, slugify
+
+# ==========================================
+# COMPACT FRONTEND BUNDLES
+# ==========================================
+# python scripts/export_bundles.py [--compare]
+IMAGE_MAP_FILE = 'assets/data/image_map.json'
+LEAGUE_MAP_FILE = 'assets/data/league_map.json'
+DB_FILE = 'db.json'
+BUNDLE_DIR = 'assets/data/bundles'
+MANIFEST_FILE = 'assets/data/bundles/manifest.json'
+
+FORMAT_VERSION = 1
+HASH_LEN = 12
+COLUMNS = ["team", "league", "status", "logo", "srcset"]
+PARSE_RUNS = 20
+
+def compact(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+class Interner:
+    """Values stored once in a table and referenced by index."""
+    def __init__(self):
+        self.table = []
+        self._ids = {}
+
+    def __call__(self, value):
+        if value not in self._ids:
+            self._ids[value] = len(self.table)
+            self.table.append(value)
+        return self._ids[value]
+
+def split_url(url):
+    """"/assets/logos/h/ab12.webp" -> ("/assets/logos/h/", "ab12.webp")"""
+    head, _, tail = url.rpartition('/')
+    return head + '/', tail
+
+# ==========================================
+# SHARDS
+# ==========================================
+def build_shards(image_map, league_map, records):
+    """
+    { sport_slug: shard } where a shard holds every team of one sport:
+      "prefixes": ["/assets/logos/h/", ...]   URL directories, stored once
+      "leagues":  ["NBA", ...]                league names, stored once
+      "columns":  COLUMNS, "rows": [[team, league_id, status, [prefix_id, file], srcset], ...]
+      "slugs":    { league_map slug: league_id }
+    srcset is { fmt: [[prefix_id, file, "2x"], ...] } or 0.
+    """
+    logos = image_map.get('teams', {})
+    srcsets = image_map.get('srcset', {})
+    teams = {}   # sport -> {team: record}
+    for rec in records:
+        teams.setdefault(rec.get('Sport') or "other", {}).setdefault(rec['Team'], rec)
+    known = {rec['Team'] for rec in records}
+    for team in logos:
+        if team not in known:
+            teams.setdefault("other", {})[team] = {"Team": team}
+
+    shards = {}
+    for sport, members in sorted(teams.items()):
+        prefixes, leagues = Interner(), Interner()
+
+        def url(u):
+            prefix, name = split_url(u)
+            return [prefixes(prefix), name]
+
+        def srcset(value):
+            """"u1 1x, u2 2x" -> [[prefix_id, file, "1x"], ...]"""
+            entries = []
+            for entry in value.split(', '):
+                u, _, density = entry.partition(' ')
+                entries.append(url(u) + [density])
+            return entries
+
+        rows = []
+        for team in sorted(members):
+            rec = members[team]
+            league = rec.get('League')
+            sets = {fmt: srcset(value) for fmt, value in sorted(srcsets.get(team, {}).items())}
+            rows.append([
+                team,
+                leagues(league) if league else -1,
+                rec.get('Status') or "",
+                url(logos[team]) if team in logos else 0,
+                sets or 0,
+            ])
+
+        slugs = {slug: leagues(league) for slug, league in sorted(league_map.items())
+                 if LEAGUE_SPORTS.get(league, "other") == sport}
+        shards[slugify(sport) or "other"] = {
+            "prefixes": prefixes.table,
+            "leagues": leagues.table,
+            "columns": COLUMNS,
+            "rows": rows,
+            "slugs": slugs,
+        }
+    return shards
+
+# ==========================================
+# WRITING
+# ==========================================
+def write_bytes(path, data):
+    atomic_write(path, data)
+
+def write_shard(name, data, out_dir=BUNDLE_DIR):
+    """Writes <name>.<hash>.json plus .gz/.br siblings unless already there. Returns its manifest entry."""
+    digest = hashlib.sha256(data).hexdigest()
+    file = f"{name}.{digest[:HASH_LEN]}.json"
+    path = os.path.join(out_dir, file)
+    entry = {"file": file, "sha256": digest, "bytes": len(data)}
+
+    variants = {"gzip": (path + ".gz", lambda: gzip.compress(data, 9, mtime=0))}
+    if brotli:
+        variants["br"] = (path + ".br", lambda: brotli.compress(data, quality=11))
+
+    if not os.path.exists(path): write_bytes(path, data)
+    for kind, (target, compress) in variants.items():
+        if not os.path.exists(target): write_bytes(target, compress())
+        entry[kind] = os.path.getsize(target)
+    return entry
+
+def export(out_dir=BUNDLE_DIR, manifest_file=MANIFEST_FILE):
+    """Writes every shard and the manifest; removes shards no longer listed. Returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    with locked(manifest_file):
+        return _export(out_dir, manifest_file)
+
+def _export(out_dir, manifest_file):
+    # An unreadable input raises CorruptFile: publishing it as empty would delete the good shards
+    shards = build_shards(read_json(IMAGE_MAP_FILE, {}), read_json(LEAGUE_MAP_FILE, {}), read_json(DB_FILE, []))
+
+    entries = {name: dict(write_shard(name, compact(shard), out_dir), teams=len(shard["rows"]))
+               for name, shard in shards.items()}
+    # The version changes exactly when some shard's content does
+    version = hashlib.sha256(compact({n: e["sha256"] for n, e in entries.items()})).hexdigest()[:HASH_LEN]
+    manifest = {"format": FORMAT_VERSION, "version": version, "shards": entries}
+
+    try: old = read_json(manifest_file, {})
+    except CorruptFile: old = {}    # Our own output: rewritten below
+    if old.get("version") != version:
+        manifest["generated"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        write_bytes(manifest_file, json.dumps(manifest, indent=1, sort_keys=True).encode())
+    else:
+        manifest = old
+
+    keep = {os.path.basename(manifest_file)}
+    for e in entries.values():
+        keep |= {e["file"], e["file"] + ".gz", e["file"] + ".br"}
+    for f in os.listdir(out_dir):
+        if f not in keep and not f.endswith((".tmp", ".lock")):
+            os.remove(os.path.join(out_dir, f))
+    return manifest
+
+# ==========================================
+# COMPARISON
+# ==========================================
+def parse_ms(data):
+    """Median json.loads time in ms."""
+    runs = []
+    for _ in range(PARSE_RUNS):
+        start = time.perf_counter()
+        json.loads(data)
+        runs.append(time.perf_counter() - start)
+    return 1000 * statistics.median(runs)
+
+def measure(paths):
+    blobs = [open(p, 'rb').read() for p in paths if os.path.exists(p)]
+    return {
+        "files": len(blobs),
+        "bytes": sum(len(b) for b in blobs),
+        "gzip": sum(len(gzip.compress(b, 9)) for b in blobs),
+        "br": sum(len(brotli.compress(b, quality=11)) for b in blobs) if brotli else None,
+        "parse_ms": sum(parse_ms(b) for b in blobs),
+    }
+
+def compare(manifest, out_dir=BUNDLE_DIR):
+    """Prints current files vs all shards vs the largest single shard (one sport's page)."""
+    shards = [os.path.join(out_dir, e["file"]) for e in manifest["shards"].values()]
+    largest = max(shards, key=os.path.getsize) if shards else None
+    rows = [
+        ("current", measure([IMAGE_MAP_FILE, LEAGUE_MAP_FILE, DB_FILE])),
+        ("bundles", measure(shards)),
+        (f"1 shard ({os.path.basename(largest).split('.')[0]})" if largest else "1 shard", measure([largest] if largest else [])),
+    ]
+    print(f"   {'':<24}{'files':>6}{'raw KB':>10}{'gzip KB':>10}{'br KB':>10}{'parse ms':>10}")
+    for name, m in rows:
+        br = f"{m['br'] / 1024:.1f}" if m['br'] is not None else "-"
+        print(f"   {name:<24}{m['files']:>6}{m['bytes'] / 1024:>10.1f}{m['gzip'] / 1024:>10.1f}{br:>10}{m['parse_ms']:>10.2f}")
+    return dict(rows)
+
+def main():
+    manifest = export()
+    print(f"--- Bundles v{manifest['version']}: {len(manifest['shards'])} shards"
+          f"{'' if brotli else ' (no brotli: .br skipped)'} ---")
+    if "--compare" in sys.argv:
+        compare(manifest)
+
+if __name__ == "__main__":
+    with metrics.run("export_bundles"):
+        main()
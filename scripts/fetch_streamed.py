@@ -1,107 +1,123 @@
 import os
-import requests
-import re
-import time
-from PIL import Image
-from io import BytesIO
+import sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from net import make_session, HostRateLimiter
+from badge_cache import BadgeManifest, FailureCache, save_image_optimized
+from asset_store import AssetStore
+from matcher import SlugMatcher, normalize
+from identity import slugify, team_key, logo_index, load_league_map
+from snapshot import iter_feed, refresh_requested, FeedUnavailable
+import metrics
 
 # ==========================================
 # 1. CONFIGURATION
 # ==========================================
-BACKEND_URL = "https://vercelapi-olive.vercel.app/api/sync-nodes?country=us"
-STREAMED_BASE = "https://streamed.pk/api/images/badge/"
+STREAMED_BASE = os.environ.get("STREAMED_BASE_URL", "https://streamed.pk/api/images/badge/")
 
-TSDB_DIR = "assets/logos/tsdb"
+TSDB_DIR = "assets/logos/tsdb"          # Logical folders: logos live in the asset store
 STREAMED_DIR = "assets/logos/streamed"
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 }
 
+# Concurrency
+DOWNLOAD_WORKERS = 8      # In-flight badge downloads over one keep-alive session
+ENCODE_WORKERS = os.cpu_count() or 2
+BADGE_RATE = 10.0         # Requests / second per host. Replaces the fixed sleep.
+
 # ==========================================
 # 2. UTILS
 # ==========================================
-def slugify(name):
-    if not name: return None
-    clean = str(name).lower()
-    clean = re.sub(r"[^\w\s-]", "", clean)
-    clean = re.sub(r"\s+", "-", clean)
-    return clean.strip("-")
-
-def save_image_optimized(url, save_path):
-    """
-    Downloads image, Resizes to 60x60, Converts to WEBP
-    """
-    if os.path.exists(save_path): return False
-    
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        if resp.status_code == 200:
-            img = Image.open(BytesIO(resp.content))
-            
-            # 1. Convert to RGBA
-            if img.mode != 'RGBA': 
-                img = img.convert('RGBA')
-            
-            # 2. High Quality Resize to 60x60
-            img = img.resize((60, 60), Image.Resampling.LANCZOS)
-            
-            # 3. Save as WebP
-            img.save(save_path, "WEBP", quality=90, method=6)
-            return True
-    except: 
-        pass
-    return False
+def team_logos(matches):
+    """Yields (team, sport, logo) the first time each team identity shows up with a logo."""
+    seen = set()
+    for m in matches:
+        for role in ('team_a', 'team_b'):
+            name, logo = m.get(role), m.get(f'{role}_logo')
+            if name and logo and team_key(name) not in seen:
+                seen.add(team_key(name))
+                yield name, m.get('sport'), logo
 
 # ==========================================
 # 3. MAIN EXECUTION
 # ==========================================
+def fill_gaps(matches, manifest, store, refresh=False, failures=None, league_map=None):
+    """
+    Downloads streamed badges for teams TSDB does not cover into the asset
+    store, DOWNLOAD_WORKERS at a time, queued while matches are still
+    streaming in. Returns the count.
+    league_map (in memory, e.g. from fetch_tsdb) replaces the file on disk.
+    """
+    session = make_session(pool_size=DOWNLOAD_WORKERS, headers=HEADERS)
+    limiter = HostRateLimiter(default_rate=BADGE_RATE)
+
+    # Index stored logos once by team identity (TSDB badges scoped to their sport)
+    tsdb_slugs = store.slugs(TSDB_DIR)
+    if league_map is None: league_map = load_league_map()
+    tsdb_index = logo_index(tsdb_slugs, league_map)
+    tsdb_matcher = SlugMatcher(tsdb_slugs)
+    streamed_index = logo_index(store.slugs(STREAMED_DIR))
+
+    claimed = set()  # Two spellings of one team share a file: download once
+    downloads = {}
+    with ThreadPoolExecutor(DOWNLOAD_WORKERS) as pool, ProcessPoolExecutor(ENCODE_WORKERS) as encode_pool:
+        for team_name, sport, badge_id in team_logos(matches):
+            slug = slugify(team_name)
+            if not slug: continue
+
+            # 1. CHECK TSDB (Priority 1) - If we have high quality logo, skip.
+            #    Fuzzy only for names TSDB has no identity for at all
+            if tsdb_index.get(team_name, sport):
+                continue
+            if team_name not in tsdb_index and tsdb_matcher.best_match(normalize(team_name), cutoff=0.7):
+                continue
+
+            # 2. CHECK STREAMED (Priority 2) - If we already saved it (under any spelling), skip.
+            slug = streamed_index.get(team_name, default=slug)
+            streamed_path = f"{STREAMED_DIR}/{slug}.webp"
+            if (store.has(streamed_path) and not refresh) or streamed_path in claimed:
+                continue
+            claimed.add(streamed_path)
+
+            # 3. DOWNLOAD & RESIZE
+            if "http" in badge_id:
+                src_url = badge_id
+            else:
+                src_url = f"{STREAMED_BASE}{badge_id}.webp"
+
+            dl = pool.submit(metrics.bind(save_image_optimized), src_url, streamed_path, session, manifest,
+                             store, refresh, failures, limiter, encode_pool)
+            downloads[dl] = slug
+
+        count = 0
+        for dl in as_completed(downloads):
+            if dl.result():
+                print(f"   [+] Filled Gap: {downloads[dl]}.webp")
+                count += 1
+    return count
+
 def main():
-    os.makedirs(STREAMED_DIR, exist_ok=True)
-    print("--- Starting Gap-Filler Harvester (60x60 Optimized) ---")
+    refresh = "--refresh" in sys.argv
+    manifest = BadgeManifest()
+    failures = FailureCache()
+    store = AssetStore()
+    print(f"--- Starting Gap-Filler Harvester (60x60 Optimized{', Refresh' if refresh else ''}) ---")
     
+    # Badges are fetched while the feed is still downloading
     try:
-        data = requests.get(BACKEND_URL, headers=HEADERS).json()
-        matches = data.get('matches', [])
-    except:
+        count = fill_gaps(iter_feed(refresh=refresh_requested()), manifest, store, refresh, failures)
+    except FeedUnavailable:
         print("CRITICAL: Backend unavailable")
         return
 
-    # Gather needed teams
-    tasks = {}
-    for m in matches:
-        if m.get('team_a') and m.get('team_a_logo'):
-            tasks[m['team_a']] = m['team_a_logo']
-        if m.get('team_b') and m.get('team_b_logo'):
-            tasks[m['team_b']] = m['team_b_logo']
-
-    count = 0
-    for team_name, badge_id in tasks.items():
-        slug = slugify(team_name)
-        if not slug: continue
-
-        # 1. CHECK TSDB (Priority 1) - If we have high quality logo, skip.
-        tsdb_path = os.path.join(TSDB_DIR, f"{slug}.webp")
-        if os.path.exists(tsdb_path):
-            continue 
-
-        # 2. CHECK STREAMED (Priority 2) - If we already saved it, skip.
-        streamed_path = os.path.join(STREAMED_DIR, f"{slug}.webp")
-        if os.path.exists(streamed_path):
-            continue
-
-        # 3. DOWNLOAD & RESIZE
-        if "http" in badge_id:
-            src_url = badge_id
-        else:
-            src_url = f"{STREAMED_BASE}{badge_id}.webp"
-            
-        if save_image_optimized(src_url, streamed_path):
-            print(f"   [+] Filled Gap: {slug}.webp")
-            count += 1
-            time.sleep(0.2)
-
-    print(f"--- Done. Filled {count} missing logos. ---")
+    manifest.save()
+    failures.save()
+    store.gc()   # Files a refreshed badge replaced
+    store.save()
+    print(f"--- Done. Filled {count} missing logos ({len(failures)} badges waiting for re-check). ---")
 
 if __name__ == "__main__":
-    main()
+    with metrics.run("fetch_streamed"):
+        main()
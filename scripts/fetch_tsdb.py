@@ -1,24 +1,34 @@
 import os
-import requests
+import sys
 import urllib.parse
-import re
-import time
-import json
-from PIL import Image
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from net import make_session, HostRateLimiter, DEFAULT_HEADERS
+from images import VARIANTS
+from badge_cache import BadgeManifest, save_image_optimized
+from asset_store import AssetStore
+from identity import slugify
+import metrics
+from persist import write_json
 
 # ==========================================
 # 1. CONFIGURATION
 # ==========================================
 API_KEY = "123"
-BASE_URL = f"https://www.thesportsdb.com/api/v1/json/{API_KEY}"
-SAVE_DIR = "assets/logos/tsdb"
+BASE_URL = os.environ.get("TSDB_BASE_URL", f"https://www.thesportsdb.com/api/v1/json/{API_KEY}")
+SAVE_DIR = "assets/logos/tsdb"     # Logical folder: logos live in the asset store
 LEAGUE_MAP_FILE = "assets/data/league_map.json"
 
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-}
+HEADERS = DEFAULT_HEADERS
+
+# Concurrency
+LEAGUE_WORKERS = 4        # In-flight league queries
+DOWNLOAD_WORKERS = 16     # In-flight badge downloads
+ENCODE_WORKERS = os.cpu_count() or 2
+
+# Per-host rate limits (requests / second). Replaces the fixed sleep.
+API_RATE = 2.0
+BADGE_RATE = 20.0
 
 # Supported Leagues
 LEAGUES = {
@@ -49,91 +59,98 @@ LEAGUES = {
 # ==========================================
 # 2. UTILS
 # ==========================================
-def slugify(name):
-    if not name: return None
-    clean = str(name).lower()
-    clean = re.sub(r"[^\w\s-]", "", clean)
-    clean = re.sub(r"\s+", "-", clean)
-    return clean.strip("-")
-
-def save_image_optimized(url, save_path):
-    """
-    Downloads image, Resizes to 60x60, Converts to WEBP
-    """
-    if os.path.exists(save_path): return False
-    
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        if resp.status_code == 200:
-            img = Image.open(BytesIO(resp.content))
-            
-            # 1. Convert to RGBA (Preserve Transparency)
-            if img.mode != 'RGBA': 
-                img = img.convert('RGBA')
-            
-            # 2. High Quality Resize to 60x60
-            img = img.resize((60, 60), Image.Resampling.LANCZOS)
-            
-            # 3. Save as WebP (Optimized)
-            img.save(save_path, "WEBP", quality=90, method=6)
-            return True
-    except: 
-        pass
-    return False
+def fetch_league(session, limiter, tsdb_name):
+    encoded = urllib.parse.quote(tsdb_name)
+    url = f"{BASE_URL}/search_all_teams.php?l={encoded}"
+    limiter.wait(url)
+    data = session.get(url, timeout=10).json()
+    return (data or {}).get('teams') or []
 
 # ==========================================
 # 3. MAIN EXECUTION
 # ==========================================
+def harvest(manifest, store, refresh=False):
+    """Downloads every league's badges into the asset store. Returns the { team_slug: league } map."""
+    league_map = {}
+
+    sizes = ", ".join(f"{size}px {fmt}" for size, fmt in VARIANTS)
+    print(f"--- Starting TSDB Harvester ({sizes}{', Refresh' if refresh else ''}) ---")
+
+    api_host = urllib.parse.urlparse(BASE_URL).netloc
+    limiter = HostRateLimiter(default_rate=BADGE_RATE, rates={api_host: API_RATE})
+    session = make_session(pool_size=LEAGUE_WORKERS + DOWNLOAD_WORKERS)
+
+    claimed = set()  # Same club appears in several leagues: download once
+    results = {}
+    saved = {name: 0 for name in LEAGUES}
+
+    with ThreadPoolExecutor(LEAGUE_WORKERS) as league_pool, \
+         ThreadPoolExecutor(DOWNLOAD_WORKERS) as download_pool, \
+         ProcessPoolExecutor(ENCODE_WORKERS) as encode_pool:
+
+        league_jobs = {
+            league_pool.submit(metrics.bind(fetch_league), session, limiter, tsdb_name): display_name
+            for display_name, tsdb_name in LEAGUES.items()
+        }
+        downloads = {}
+
+        # 2. Queue badge downloads as soon as each league answers
+        for job in as_completed(league_jobs):
+            display_name = league_jobs[job]
+            try:
+                teams = job.result()
+            except Exception as e:
+                print(f" > {display_name}: [!] Error: {e}")
+                continue
+
+            if not teams:
+                print(f" > {display_name}: [-] No teams found.")
+                continue
+
+            results[display_name] = teams
+            for t in teams:
+                name = t.get('strTeam')
+                badge = t.get('strTeamBadge') or t.get('strBadge')
+                if not (name and badge): continue
+
+                path = f"{SAVE_DIR}/{slugify(name)}.webp"
+                if path in claimed: continue
+                claimed.add(path)
+
+                dl = download_pool.submit(metrics.bind(save_image_optimized), badge, path, session, manifest,
+                                          store, refresh, limiter=limiter, encode_pool=encode_pool)
+                downloads[dl] = display_name
+
+        # 3. Collect images
+        for dl in as_completed(downloads):
+            if dl.result():
+                saved[downloads[dl]] += 1
+
+    # 4. Map Team to League (LEAGUES order, so later leagues win as before)
+    for display_name in LEAGUES:
+        for t in results.get(display_name, []):
+            team_key = slugify(t.get('strTeam'))
+            if team_key:
+                league_map[team_key] = display_name
+        if saved[display_name] > 0:
+            print(f" > {display_name}: [+] Saved {saved[display_name]} new logos.")
+    return league_map
+
 def main():
-    os.makedirs(SAVE_DIR, exist_ok=True)
-    
-    # 1. Create folder for data and Initialize Map
-    os.makedirs(os.path.dirname(LEAGUE_MAP_FILE), exist_ok=True)
-    league_map = {} 
-
-    print("--- Starting TSDB Harvester (60x60 Optimized) ---")
-
-    for display_name, tsdb_name in LEAGUES.items():
-        print(f" > Checking: {display_name}")
-        encoded = urllib.parse.quote(tsdb_name)
-        url = f"{BASE_URL}/search_all_teams.php?l={encoded}"
-        
-        try:
-            data = requests.get(url, headers=HEADERS, timeout=10).json()
-            if data and data.get('teams'):
-                count = 0
-                for t in data['teams']:
-                    name = t.get('strTeam')
-                    
-                    # 2. Map Team to League
-                    if name:
-                        team_key = slugify(name)
-                        if team_key:
-                            league_map[team_key] = display_name
-
-                    # 3. Process Images
-                    badge = t.get('strTeamBadge') or t.get('strBadge')
-                    
-                    if name and badge:
-                        slug = slugify(name)
-                        path = os.path.join(SAVE_DIR, f"{slug}.webp")
-                        if save_image_optimized(badge, path):
-                            count += 1
-                
-                if count > 0: print(f"   [+] Saved {count} new logos.")
-            else:
-                print(f"   [-] No teams found.")
-                
-        except Exception as e:
-            print(f"   [!] Error: {e}")
-        
-        time.sleep(1.5) # Rate limit safety
-
-    # 4. Save the Map (OUTSIDE the loop)
-    with open(LEAGUE_MAP_FILE, 'w') as f:
-        json.dump(league_map, f, indent=2)
-    
+    refresh = "--refresh" in sys.argv
+    manifest = BadgeManifest()
+    store = AssetStore()
+
+    league_map = harvest(manifest, store, refresh)
+    manifest.save()
+    store.gc()   # Files a refreshed badge replaced
+    store.save()
+
+    # 5. Save the Map
+    write_json(LEAGUE_MAP_FILE, league_map, indent=2)
+
     print(f"--- League Map Saved ({len(league_map)} teams) ---")
 
 if __name__ == "__main__":
-    main()
+    with metrics.run("fetch_tsdb"):
+        main()
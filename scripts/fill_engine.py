@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import metrics
+from persist import write_json
+from identity import scoped_key
+from model_registry import is_not_found
+from model_output import ObjectStream, stream_text
+
+# ==========================================
+# BATCHED, CONCURRENT LEAGUE FILLING
+# ==========================================
+CHECKPOINT_FILE = 'scripts/fill_checkpoint.json'
+FILL_COLUMNS = ("Team", "Sport")
+WORKERS = 4           # Requests in flight
+START_RATE = 0.25     # Requests / second (15 RPM)
+MAX_RATE = 1.0
+MIN_RATE = 0.02
+MAX_ATTEMPTS = 4      # Per batch
+MAX_REQUEUES = 2      # Times a row left out of an answer is asked again
+
+class ModelNotFound(Exception):
+    pass
+
+def is_quota_error(error):
+    error = str(error)
+    return "429" in error or "RESOURCE_EXHAUSTED" in error
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate backs off multiplicatively on
+    429 / RESOURCE_EXHAUSTED and recovers additively on success (AIMD).
+    """
+    def __init__(self, rate=START_RATE, capacity=WORKERS, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if wait <= 0:
+                    wait = (1 - self.tokens) / self.rate
+            metrics.sleep(wait)
+
+    def throttle(self, backoff):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+
+    def reward(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.min_rate)
+
+# ---------- Resume checkpoint ----------
+def load_checkpoint(path=CHECKPOINT_FILE):
+    try:
+        with open(path, 'r') as f: return set(json.load(f).get('attempted', []))
+    except: return set()
+
+def save_checkpoint(attempted, path=CHECKPOINT_FILE):
+    write_json(path, {'attempted': sorted(attempted)})
+
+# ---------- Engine ----------
+def fill_payload(team):
+    return {"Team": team['Team'], "Sport": team['Sport']}
+
+def valid_league(league):
+    league = str(league or "").strip()
+    return league if league and league.lower() != "unknown" else None
+
+def ask_batch(client, model, packer, batch):
+    """
+    { row index: answer } for one batch, parsed while the reply streams in.
+    Rows that parsed are kept when others are malformed or the stream
+    breaks off; raises only if no row came back.
+    """
+    answers = []
+    with metrics.timed("genai"):
+        try:
+            for answer in ObjectStream(stream_text(client, model, packer.render(batch))):
+                answers.append(answer)
+        except Exception:
+            if not answers: raise
+    matched = packer.match(batch, answers)
+    if not matched: raise ValueError("No usable rows in response")
+    return matched
+
+def fill_leagues(store, client, models, packer, limit=None,
+                 workers=WORKERS, bucket=None, checkpoint_file=CHECKPOINT_FILE, backoff=30, cache=None):
+    """
+    Fills empty Leagues in the store, as many teams per prompt as the
+    PromptPacker's token budgets allow and up to `workers` prompts in
+    flight under an adaptive token bucket. Answers map back by row id.
+    `models` is a ModelSelector: a 404 moves to the next model and retries.
+
+    Each finished batch is written to the store straight away and its
+    teams recorded in the checkpoint, so an interrupted run resumes with
+    the teams it has not asked about yet. The checkpoint resets once every
+    pending team has been tried. Rows a reply left out or garbled are
+    packed into new batches (up to MAX_REQUEUES times each); rows that did
+    come back are never asked again.
+
+    With an AICache, teams answered before (same model, template and
+    Team/Sport) are served from it, and every new answer is stored per
+    team, so a retried or re-packed batch only pays for unseen teams.
+    Returns {filled, requests, failed, cached, requeued}.
+    """
+    bucket = bucket or AdaptiveTokenBucket(capacity=workers)
+    prompt_template = packer.template
+    attempted = load_checkpoint(checkpoint_file)
+
+    pending = store.find(league="")
+    targets = [t for t in pending if scoped_key(t['Team'], t['Sport']) not in attempted]
+    if not targets and attempted:
+        attempted = set()
+        targets = pending
+    stats = {'filled': 0, 'requests': 0, 'failed': 0, 'cached': 0, 'requeued': 0}
+
+    if cache:
+        misses = []
+        for t in targets:
+            hit, league = cache.get(models.model, prompt_template, fill_payload(t))
+            if not hit:
+                misses.append(t)
+                continue
+            stats['cached'] += 1
+            attempted.add(scoped_key(t['Team'], t['Sport']))
+            league = valid_league(league)
+            if league and store.update(t['Team'], t['Sport'], League=league, Status="AI_Filled", Resolver="gemini"):
+                stats['filled'] += 1
+        targets = misses
+
+    targets = targets[:limit] if limit else targets
+    batches = packer.pack(targets)
+    lock = threading.Lock()
+    stop = threading.Event()
+    requeues = {}   # scoped key -> times asked again
+
+    def run(batch):
+        for attempt in range(MAX_ATTEMPTS):
+            if stop.is_set(): return None, None
+            model = models.model
+            if attempt: metrics.incr("genai", "retries")
+            bucket.acquire()
+            with lock: stats['requests'] += 1
+            try:
+                results = ask_batch(client, model, packer, batch)
+                bucket.reward()
+                models.succeeded(model)
+                return results, model
+            except Exception as e:
+                if is_quota_error(e):
+                    print(f"     ⏳ Quota hit. Backing off {backoff * 2 ** attempt}s...")
+                    bucket.throttle(backoff * 2 ** attempt)
+                elif is_not_found(e):
+                    if not models.failed(model, e):
+                        stop.set()
+                        raise ModelNotFound(str(e))
+                else:
+                    print(f"     [!] Error: {str(e)[:100]}")
+        return None, None
+
+    print(f" > Filling {len(targets)} teams in {len(batches)} batches ({workers} in flight)")
+    with ThreadPoolExecutor(workers) as pool:
+        jobs = {}
+        def submit(batch):
+            jobs[pool.submit(metrics.bind(run), batch)] = batch
+
+        for b in batches: submit(b)
+        while jobs:
+            done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for job in done:
+                batch = jobs.pop(job)
+                try:
+                    results, model = job.result()
+                except ModelNotFound:
+                    print("     [!] No model left for this key. Stopping.")
+                    continue
+
+                if results is None:
+                    stats['failed'] += 1
+                    continue
+
+                for i, res in results.items():
+                    rec = batch[i]
+                    if cache: cache.put(model, prompt_template, fill_payload(rec), res.get('League'))
+
+                    league = valid_league(res.get('League'))
+                    if league and store.update(rec['Team'], rec['Sport'], League=league, Status="AI_Filled", Resolver="gemini"):
+                        stats['filled'] += 1
+
+                # Only the rows missing from the reply are asked again
+                retry = []
+                for i, t in enumerate(batch):
+                    key = scoped_key(t['Team'], t['Sport'])
+                    if i not in results and requeues.get(key, 0) < MAX_REQUEUES:
+                        requeues[key] = requeues.get(key, 0) + 1
+                        retry.append(t)
+                    else:
+                        attempted.add(key)
+                save_checkpoint(attempted, checkpoint_file)
+                if retry and not stop.is_set():
+                    stats['requeued'] += len(retry)
+                    for b in packer.pack(retry): submit(b)
+
+    return stats
@@ -1,85 +1,194 @@
-import os
+import sys
 import json
-import requests
-from difflib import get_close_matches
+import hashlib
+
+from matcher import SlugMatcher, normalize
+from identity import KeyIndex, LEAGUE_SPORTS, load_league_map
+from snapshot import iter_feed, refresh_requested, FeedUnavailable
+from asset_store import AssetStore
+import metrics
+from persist import CorruptFile, locked, atomic_write, read_json
 
 # CONFIG
-BACKEND_URL = "https://vercelapi-olive.vercel.app/api/sync-nodes?country=us"
-DIRS = {
+DIRS = {   # Logical logo folders in the asset store, priority order
     'tsdb': 'assets/logos/tsdb',
     'streamed': 'assets/logos/streamed'
 }
 OUTPUT_FILE = 'assets/data/image_map.json'
+MANIFEST_FILE = 'scripts/map_manifest.json'
+MANIFEST_VERSION = 2
+SRCSET = True       # Emit high-DPI / AVIF variants per team
 
-def normalize(name):
-    if not name: return ""
-    return "".join([c for c in name.lower() if c.isalnum()])
+# ==========================================
+# INPUTS
+# ==========================================
+def scan_logos(store):
+    """
+    Returns ({ "/logical_path": "slug" }, fingerprint) from the asset
+    store index, TSDB first. The fingerprint covers what every path
+    serves (variants included), so it changes when any logo is added,
+    removed or rewritten.
+    """
+    logos = {}
+    stamp = hashlib.sha1()
 
-def main():
-    # 1. Load Local Files
-    logos = {} # { "slug": "full_path" }
-    
-    # Load TSDB first (Highest Priority)
-    if os.path.exists(DIRS['tsdb']):
-        for f in os.listdir(DIRS['tsdb']):
-            if f.endswith('.webp'):
-                logos[f.replace('.webp', '')] = f"/{DIRS['tsdb']}/{f}"
-
-    # Load Streamed second (Gap fillers)
-    if os.path.exists(DIRS['streamed']):
-        for f in os.listdir(DIRS['streamed']):
-            if f.endswith('.webp'):
-                slug = f.replace('.webp', '')
-                if slug not in logos: # Don't overwrite TSDB
-                    logos[slug] = f"/{DIRS['streamed']}/{f}"
-
-    print(f"--- Map Generator: Found {len(logos)} unique logos ---")
-
-    # 2. Fetch Backend
-    try:
-        data = requests.get(BACKEND_URL).json()
-        matches = data.get('matches', [])
-    except:
-        return
+    # TSDB first (Highest Priority), Streamed second (Gap fillers)
+    for d in DIRS.values():
+        for slug in store.slugs(d):
+            path = f"{d}/{slug}.webp"
+            logos[f"/{path}"] = slug
+            stamp.update(f"{path}:{store.url(path)}:{json.dumps(store.srcset(path), sort_keys=True)}\n".encode())
+
+    return logos, stamp.hexdigest()
+
+def load_manifest(path=MANIFEST_FILE):
+    """{ "logos": {"fingerprint", "leagues", "paths"}, "teams": { team: {path, sport, method, score} } }"""
+    try: data = read_json(path, {})
+    except CorruptFile: return {}, {}   # A cache: rebuilt if unreadable
+    if data.get('version') != MANIFEST_VERSION: return {}, {}
+    return data.get('logos') or {}, data.get('teams') or {}
+
+def write_atomic(path, text):
+    """Writes via temp file + rename under the file lock; skips the write if the content is unchanged."""
+    with locked(path):
+        return atomic_write(path, text, skip_unchanged=True)
+
+# ==========================================
+# MATCHING
+# ==========================================
+class LogoIndex:
+    """
+    Logos by team identity (exact, TSDB badges scoped to their league's
+    sport) and by slug (fuzzy fallback, TSDB winning slug clashes).
+    """
+    def __init__(self, paths, league_map=None):
+        league_map = league_map or {}
+        tsdb = f"/{DIRS['tsdb']}/"
+        self.by_slug = {}
+        for path, slug in paths.items():
+            self.by_slug.setdefault(slug, path)
+        self.index = KeyIndex(
+            (slug, path, LEAGUE_SPORTS.get(league_map.get(slug)) if path.startswith(tsdb) else None)
+            for path, slug in paths.items()
+        )
+        self._matcher = None
+
+    @property
+    def matcher(self):
+        if self._matcher is None: self._matcher = SlugMatcher(self.by_slug)
+        return self._matcher
+
+def match_team(team_name, sport, logos):
+    """Returns {path, sport, method, score} for one team."""
+    # 1. Exact Check (same identity, same sport)
+    path = logos.index.get(team_name, sport)
+    if path:
+        return {'path': path, 'sport': sport, 'method': 'exact', 'score': 1.0}
+
+    # 2. Fuzzy Check (High confidence only), only for names no logo shares an identity with
+    if team_name not in logos.index:
+        found = logos.matcher.best(normalize(team_name), n=1, cutoff=0.7)
+        if found:
+            slug, score = found[0]
+            return {'path': logos.by_slug[slug], 'sport': sport, 'method': 'fuzzy', 'score': round(score, 4)}
+    return {'path': None, 'sport': sport, 'method': 'none', 'score': 0.0}
+
+def stale_teams(deps, old_paths, paths, league_map=None):
+    """
+    Teams whose inputs changed since the manifest was written: a removed
+    chosen logo invalidates that team; a new logo invalidates a team that
+    shares its identity, or a fuzzy or missing match it matches at least
+    as well.
+    """
+    removed = set(old_paths) - set(paths)
+    added = {path: slug for path, slug in paths.items() if path not in old_paths}
+    fresh = LogoIndex(added, league_map) if added else None
+    stale = set()
+    for team, dep in deps.items():
+        if dep.get('path') in removed:
+            stale.add(team)
+        elif fresh and team in fresh.index:
+            stale.add(team)
+        elif fresh and dep.get('method') != 'exact':
+            cutoff = max(0.7, dep.get('score', 0.0) - 1e-4)   # Ties may win on slug order
+            if fresh.matcher.best(normalize(team), n=1, cutoff=cutoff):
+                stale.add(team)
+    return stale
+
+def build_map(matches, full=False, league_map=None, store=None):
+    """
+    Returns (image_map, manifest) as JSON-ready dicts; nothing is written here.
+    league_map (in memory, e.g. from fetch_tsdb) replaces the file on disk;
+    store (e.g. the one the harvesters filled) replaces the index on disk.
+    """
+    # 1. Load the stored logos
+    if store is None: store = AssetStore()
+    paths, fingerprint = scan_logos(store)
+    if league_map is None: league_map = load_league_map()
+    leagues = hashlib.sha1(json.dumps(league_map, sort_keys=True).encode()).hexdigest()
+    logos = LogoIndex(paths, league_map)
+    print(f"--- Map Generator: Found {len(logos.by_slug)} unique logos ---")
 
-    # 3. Create Map
-    team_map = {}
-    available_slugs = list(logos.keys())
+    old_logos, deps = ({}, {}) if full else load_manifest()
+    if old_logos.get('leagues') != leagues: deps = {}   # Sport scoping changed: rematch all
+    logos_changed = old_logos.get('fingerprint') != fingerprint
 
+    # 2. Teams in the feed
+    feed = {}   # Ordered team name -> sport of its first match
     for m in matches:
         for t_key in ['team_a', 'team_b']:
             team_name = m.get(t_key)
-            if not team_name: continue
-            
-            # Target Slug
-            target_slug = "".join([c for c in team_name.lower() if c.isalnum() or c == '-']).strip('-')
-            
-            match_found = None
-            
-            # 1. Exact Check
-            if target_slug in logos:
-                match_found = logos[target_slug]
-            
-            # 2. Fuzzy Check (High confidence only)
-            else:
-                norm_search = normalize(team_name)
-                matches_fuzzy = get_close_matches(norm_search, available_slugs, n=1, cutoff=0.7)
-                if matches_fuzzy:
-                    match_found = logos[matches_fuzzy[0]]
-
-            if match_found:
-                team_map[team_name] = match_found
-
-    # 4. Save
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    
-    # Format for Frontend: { "teams": { "Arsenal": "/path/to/logo.webp" } }
+            if team_name: feed.setdefault(team_name, m.get('sport'))
+
+    # 3. Recompute new teams and teams whose logo inputs changed.
+    # Teams that left the feed keep their last match.
+    todo = [t for t in feed if t not in deps]
+    if logos_changed:
+        todo += sorted(stale_teams(deps, old_logos.get('paths') or {}, paths, league_map) - set(todo))
+
+    for team_name in todo:
+        sport = feed[team_name] if team_name in feed else deps[team_name].get('sport')
+        deps[team_name] = match_team(team_name, sport, logos)
+
+    kept = sum(1 for t in deps if t not in feed)
+    print(f"--- Matched {len(todo)} new/changed teams, reused {len(deps) - len(todo)} ({kept} not in current feed) ---")
+
+    # Sorted, so an unchanged map serializes to identical bytes
+    team_map = {team: deps[team]['path'] for team in sorted(deps) if deps[team].get('path')}
+
+    # 4. Published URLs: the content-addressed files in the asset store.
+    #    A near-duplicate logo is served its canonical copy and variants.
+    srcsets = {}
+    if SRCSET:
+        for team, path in team_map.items():
+            entry = store.srcset(path)
+            if entry: srcsets[team] = entry
+    team_map = {team: store.url(path) for team, path in team_map.items() if store.url(path)}
+
+    # Format for Frontend: { "teams": { "Arsenal": "/path/to/logo.webp" },
+    #                        "srcset": { "Arsenal": { "avif": "... 1x, ... 2x", "webp": ... } } }
     final_json = { "teams": team_map }
-    
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(final_json, f, indent=2)
-        
-    print(f"--- Map Saved with {len(team_map)} teams ---")
+    if srcsets: final_json["srcset"] = srcsets
+    return final_json, {'version': MANIFEST_VERSION,
+                        'logos': {'fingerprint': fingerprint, 'leagues': leagues, 'paths': paths},
+                        'teams': deps}
+
+def save_map(final_json, manifest):
+    """Writes image_map.json and the dependency manifest. Returns True if the map changed."""
+    write_atomic(MANIFEST_FILE, json.dumps(manifest, indent=1, sort_keys=True))
+    return write_atomic(OUTPUT_FILE, json.dumps(final_json, indent=2))
+
+def main():
+    try:
+        final_json, manifest = build_map(iter_feed(refresh=refresh_requested()), full="--full" in sys.argv)
+    except FeedUnavailable:
+        return
+
+    # 5. Save
+    changed = save_map(final_json, manifest)
+    team_map = final_json["teams"]
+    print(f"--- Map {'Saved' if changed else 'Unchanged'} with {len(team_map)} teams ---")
 
 if __name__ == "__main__":
-    main()
+    with metrics.run("generate_map"):
+        main()
@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+# ==========================================
+# SHARED TEAM IDENTITY
+# ==========================================
+LEAGUE_MAP_FILE = "assets/data/league_map.json"
+
+# League (as written by fetch_tsdb.py) -> backend sport
+LEAGUE_SPORTS = {
+    "English Premier League": "soccer",
+    "English League Championship": "soccer",
+    "Scottish Premiership": "soccer",
+    "Spanish La Liga": "soccer",
+    "German Bundesliga": "soccer",
+    "Italian Serie A": "soccer",
+    "French Ligue 1": "soccer",
+    "Dutch Eredivisie": "soccer",
+    "Portuguese Primeira Liga": "soccer",
+    "UEFA Champions League": "soccer",
+    "UEFA Europa League": "soccer",
+    "American Major League Soccer": "soccer",
+    "Saudi Pro League": "soccer",
+    "Belgian Pro League": "soccer",
+    "NBA": "basketball",
+    "NFL": "americanfootball",
+    "NHL": "hockey",
+    "MLB": "baseball",
+    "UFC": "fighting",
+    "Australian Big Bash League": "cricket",
+    "United Rugby Championship": "rugby",
+}
+
+def fold(text):
+    """Case- and accent-free text: "Atlético" -> "atletico"."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+@lru_cache(maxsize=None)
+def team_key(name):
+    """
+    Canonical identity of a name: folded, letters and digits only, so
+    "AEW: World's End", "AEW Worlds End" and "aew-worlds-end" agree.
+    """
+    if not name: return ""
+    return "".join(c for c in fold(name) if c.isalnum())
+
+def scoped_key(name, sport):
+    """Identity of a team within its sport: "Rangers" in hockey is not "Rangers" in soccer."""
+    return f"{team_key(sport or 'Unknown')}/{team_key(name)}"
+
+def slugify(name):
+    """Logo file name / league_map slug. Keeps accents, so existing files stay valid."""
+    if not name: return None
+    clean = str(name).lower()
+    clean = re.sub(r"[^\w\s-]", "", clean)
+    clean = re.sub(r"\s+", "-", clean)
+    return clean.strip("-")
+
+class KeyIndex:
+    """
+    team_key -> value, each entry optionally scoped to a sport.
+
+    Unscoped entries answer any sport. Scoped entries answer their own
+    sport, or a query without sport when no other sport claims the name;
+    a name held only by other sports is a miss, never a cross-sport hit.
+    The first value added for a (key, sport) wins.
+    """
+    def __init__(self, items=()):
+        self._entries = {}   # key -> {sport key or None: value}
+        for name, value, sport in items:
+            self.add(name, value, sport)
+
+    def add(self, name, value, sport=None):
+        key = team_key(name)
+        if key:
+            self._entries.setdefault(key, {}).setdefault(team_key(sport) if sport else None, value)
+
+    def get(self, name, sport=None, default=None):
+        scopes = self._entries.get(team_key(name))
+        if not scopes: return default
+        if sport:
+            hit = scopes.get(team_key(sport), scopes.get(None))
+            return default if hit is None else hit
+        if None in scopes: return scopes[None]
+        return next(iter(scopes.values())) if len(scopes) == 1 else default
+
+    def __contains__(self, name):
+        return team_key(name) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+def load_league_map(path=LEAGUE_MAP_FILE):
+    """{ slug: league } as written by fetch_tsdb.py; {} if missing."""
+    if not os.path.exists(path): return {}
+    try:
+        with open(path, 'r') as f: return json.load(f)
+    except: return {}
+
+def league_index(league_map):
+    """KeyIndex slug -> league, scoped to the league's sport."""
+    return KeyIndex((slug, league, LEAGUE_SPORTS.get(league)) for slug, league in league_map.items())
+
+def logo_index(slugs, league_map=None):
+    """
+    KeyIndex name -> logo slug. Slugs listed in league_map (TSDB badges)
+    are scoped to their league's sport; the rest match any sport.
+    """
+    league_map = league_map or {}
+    return KeyIndex((slug, slug, LEAGUE_SPORTS.get(league_map.get(slug))) for slug in slugs)
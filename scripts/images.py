@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image, features
+
+import metrics
+
+# ==========================================
+# LOGO IMAGE PIPELINE
+# ==========================================
+LOGO_SIZE = (60, 60)
+
+# (pixel size, format). The first entry is the primary logo; the asset
+# store keeps the rest as its size/format variants.
+VARIANTS = [
+    (60, 'webp'), (120, 'webp'), (180, 'webp'),
+    (60, 'avif'), (120, 'avif'), (180, 'avif'),
+]
+if not features.check('avif'):   # Pillow built without libavif: WebP only
+    VARIANTS = [v for v in VARIANTS if v[1] != 'avif']
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 90, 'method': 6},
+    'avif': {'format': 'AVIF', 'quality': 70, 'speed': 4},
+}
+
+# What Pillow raises for bytes that are not a usable image
+DECODE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+def decode(content):
+    """Raw image bytes -> RGBA bitmap (Preserve Transparency)."""
+    img = Image.open(BytesIO(content))
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    return img
+
+def encode_variant(img, size, fmt):
+    """High Quality Resize of a decoded bitmap, encoded as fmt."""
+    out = BytesIO()
+    img.resize((size, size), Image.Resampling.LANCZOS).save(out, **SAVE_OPTIONS[fmt])
+    return out.getvalue()
+
+def encode_variants(content, variants=None):
+    """
+    Decodes once and encodes every variant from that bitmap.
+    Returns { (size, fmt): bytes }. Pure CPU work: safe to run on a process pool.
+    """
+    img = decode(content)
+    return {(size, fmt): encode_variant(img, size, fmt) for size, fmt in (variants or VARIANTS)}
+
+def encode_logo(content):
+    """Decodes raw image bytes, Resizes to 60x60, Encodes as WEBP."""
+    return encode_variant(decode(content), LOGO_SIZE[0], 'webp')
+
+def variant_key(variant):
+    """(120, 'avif') -> '120.avif'"""
+    return f"{variant[0]}.{variant[1]}"
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+# ==========================================
+# BENCHMARK: python scripts/images.py [logo_dir]
+# ==========================================
+def main():
+    src_dir = sys.argv[1] if len(sys.argv) > 1 else "assets/logos/h"
+    sources = []
+    for name in sorted(os.listdir(src_dir)):
+        if name.endswith(('.png', '.jpg', '.webp')):
+            with open(os.path.join(src_dir, name), 'rb') as f: sources.append(f.read())
+
+    print(f"--- Variant Benchmark: {len(sources)} sources from {src_dir} ---")
+    timings = {v: 0.0 for v in VARIANTS}
+    sizes = {v: 0 for v in VARIANTS}
+    decode_time = 0.0
+
+    for content in sources:
+        start = time.perf_counter()
+        img = decode(content)
+        img.load()
+        decode_time += time.perf_counter() - start
+        for v in VARIANTS:
+            start = time.perf_counter()
+            sizes[v] += len(encode_variant(img, *v))
+            timings[v] += time.perf_counter() - start
+
+    n = len(sources) or 1
+    print(f"   decode      : {1000 * decode_time / n:6.2f} ms/logo (once, shared by {len(VARIANTS)} variants;"
+          f" saves {1000 * decode_time * (len(VARIANTS) - 1) / n:.2f} ms/logo)")
+    for size, fmt in VARIANTS:
+        print(f"   {size:>3}px {fmt:<5}: {1000 * timings[(size, fmt)] / n:6.2f} ms/logo, "
+              f"{sizes[(size, fmt)] / 1024:8.1f} KB total")
+    for size in sorted({s for s, _ in VARIANTS}):
+        webp, avif = sizes.get((size, 'webp')), sizes.get((size, 'avif'))
+        if webp and avif:
+            print(f"   {size:>3}px AVIF vs WebP: {100 * (1 - avif / webp):.0f}% bytes saved")
+
+if __name__ == "__main__":
+    with metrics.run("images"):
+        main()
@@ -0,0 +1,142 @@
+import re
+from collections import defaultdict
+
+from matcher import SlugMatcher
+from identity import LEAGUE_MAP_FILE, LEAGUE_SPORTS, slugify, league_index, load_league_map
+
+# ==========================================
+# DETERMINISTIC LEAGUE RESOLUTION (PRE-AI)
+# ==========================================
+MAP_CUTOFF = 0.88     # Fuzzy slug vs league_map
+PEER_CUTOFF = 0.90    # Fuzzy name vs same-sport teams with known leagues
+
+# Common short / alternate names -> league_map slug (TSDB's spelling). Only the
+# ones whose target the current league_map has are used.
+ALIASES = {
+    "man-utd": "manchester-united",
+    "man-united": "manchester-united",
+    "man-city": "manchester-city",
+    "spurs": "tottenham-hotspur",
+    "tottenham": "tottenham-hotspur",
+    "wolves": "wolverhampton-wanderers",
+    "newcastle": "newcastle-united",
+    "west-ham": "west-ham-united",
+    "nottm-forest": "nottingham-forest",
+    "brighton": "brighton-and-hove-albion",
+    "dundee-utd": "dundee-united",
+    "hearts": "heart-of-midlothian",
+    "psg": "paris-sg",
+    "paris-saint-germain": "paris-sg",
+    "inter": "inter-milan",
+    "milan": "ac-milan",
+    "atletico-madrid": "atlético-madrid",
+    "bayern-münchen": "bayern-munich",
+    "borussia-monchengladbach": "borussia-mönchengladbach",
+    "koln": "fc-köln",
+    "la-clippers": "los-angeles-clippers",
+    "la-lakers": "los-angeles-lakers",
+}
+
+# Affixes dropped when trying a second exact lookup ("Fulham FC" -> "fulham")
+AFFIXES = {"fc", "afc", "cf", "sc", "cd", "sk", "fk"}
+
+# Squad qualifiers -> squad: "Melbourne Victory W" plays in another league than "Melbourne Victory"
+SQUADS = {
+    "w": "women", "women": "women", "womens": "women", "ladies": "women",
+    "b": "reserves", "ii": "reserves", "reserves": "reserves", "res": "reserves",
+    "youth": "youth", "academy": "youth",
+}
+AGE_GROUP = re.compile(r"u\d{2}")
+
+def strip_affixes(slug):
+    parts = [p for p in slug.split("-") if p not in AFFIXES]
+    return "-".join(parts)
+
+def shares_word(a, b):
+    """Fuzzy guard: "rangers" vs "angers" scores 0.92 but shares no word."""
+    return bool(set(filter(None, a.split("-"))) & set(filter(None, b.split("-"))))
+
+def squad(slug):
+    """Squad qualifiers of a slug: "melbourne-victory-w" -> {"women"}, "x-u21" -> {"u21"}."""
+    parts = slug.split("-")
+    return {SQUADS[p] for p in parts if p in SQUADS} | {p for p in parts if AGE_GROUP.fullmatch(p)}
+
+def fuzzy_ok(a, b):
+    """Fuzzy guard: a shared whole word and the same squad (women, reserves, u21, ...)."""
+    return shares_word(a, b) and squad(a) == squad(b)
+
+class LeagueResolver:
+    """
+    Resolves a (team, sport) to a league without the model:
+      1. same team_key in league_map    -> "league_map"
+      2. alias / affix-stripped slug    -> "alias"
+      3. fuzzy slug over league_map     -> "league_map_fuzzy"
+      4. fuzzy name over same-sport teams already holding a league -> "peer_fuzzy"
+    Candidates whose league belongs to another sport, and fuzzy
+    candidates sharing no whole word with the team or naming another
+    squad (a women's, reserve or youth side), are rejected.
+    """
+    def __init__(self, league_map, known_teams=()):
+        self.league_map = league_map
+        self.index = league_index(league_map)
+        self.aliases = {alias: slug for alias, slug in ALIASES.items() if slug in league_map}
+        self.map_matcher = SlugMatcher(league_map.keys())
+
+        self.peer_leagues = defaultdict(dict)   # sport -> {slug: league}
+        for t in known_teams:
+            league = t.get("League")
+            slug = slugify(t["Team"])
+            if slug and league and league.lower() != "unknown":
+                self.peer_leagues[t.get("Sport")][slug] = league
+        self.peer_matchers = {sport: SlugMatcher(names) for sport, names in self.peer_leagues.items()}
+
+    @classmethod
+    def load(cls, store, path=LEAGUE_MAP_FILE):
+        return cls(load_league_map(path), store.all())
+
+    def _fits(self, league, sport):
+        expected = LEAGUE_SPORTS.get(league)
+        return expected is None or not sport or sport == expected
+
+    def _from_map(self, slug, sport):
+        league = self.league_map.get(slug)
+        return league if league and self._fits(league, sport) else None
+
+    def resolve(self, team, sport):
+        """Returns (league, resolver) or (None, None)."""
+        slug = slugify(team)
+        if not slug: return None, None
+
+        league = self.index.get(team, sport)
+        if league and self._fits(league, sport): return league, "league_map"
+
+        for variant in (self.aliases.get(slug), strip_affixes(slug), self.aliases.get(strip_affixes(slug))):
+            league = self._from_map(variant, sport) if variant else None
+            if league: return league, "alias"
+
+        for candidate, _ in self.map_matcher.best(slug, n=3, cutoff=MAP_CUTOFF):
+            league = self._from_map(candidate, sport) if fuzzy_ok(slug, candidate) else None
+            if league: return league, "league_map_fuzzy"
+
+        matcher = self.peer_matchers.get(sport)
+        if matcher:
+            for peer, _ in matcher.best(slug, n=3, cutoff=PEER_CUTOFF):
+                if peer != slug and fuzzy_ok(slug, peer):
+                    return self.peer_leagues[sport][peer], "peer_fuzzy"
+
+        return None, None
+
+def resolve_pending(store, resolver=None):
+    """
+    Fills empty Leagues that can be resolved deterministically.
+    Each filled record gets Status "Resolved" and a "Resolver" tag.
+    Returns the number of teams filled.
+    """
+    resolver = resolver or LeagueResolver.load(store)
+    filled = 0
+    for t in store.find(league=""):
+        league, how = resolver.resolve(t["Team"], t["Sport"])
+        if league and store.update(t["Team"], t["Sport"], League=league, Status="Resolved", Resolver=how):
+            print(f"   [=] {t['Team']} -> {league} ({how})")
+            filled += 1
+    return filled
@@ -0,0 +1,56 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+# ==========================================
+# TRIGRAM-INDEXED FUZZY MATCHER
+# ==========================================
+def normalize(name):
+    if not name: return ""
+    return "".join([c for c in name.lower() if c.isalnum()])
+
+def ngrams(text, n=3):
+    padded = f"{' ' * (n - 1)}{text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class SlugMatcher:
+    """
+    Builds an n-gram inverted index over the slugs once, then answers
+    "closest slug" queries by scoring only slugs that share n-grams with
+    the query. Scores are difflib SequenceMatcher ratios, so results and
+    tie-breaking match difflib.get_close_matches.
+    """
+    def __init__(self, slugs, n=3):
+        self.n = n
+        self.slugs = list(dict.fromkeys(slugs))
+        self.index = defaultdict(list)
+        for i, slug in enumerate(self.slugs):
+            for gram in ngrams(slug, n):
+                self.index[gram].append(i)
+
+    def candidates(self, query):
+        """Slug ids sharing at least one n-gram with query, most shared first."""
+        hits = defaultdict(int)
+        for gram in ngrams(query, self.n):
+            for i in self.index.get(gram, ()):
+                hits[i] += 1
+        return sorted(hits, key=hits.get, reverse=True)
+
+    def best(self, query, n=1, cutoff=0.7):
+        """Returns up to n (slug, score) pairs with score >= cutoff, best first."""
+        if not query: return []
+        sm = SequenceMatcher()
+        sm.set_seq2(query)
+        scored = []
+        for i in self.candidates(query):
+            slug = self.slugs[i]
+            sm.set_seq1(slug)
+            if sm.real_quick_ratio() >= cutoff and sm.quick_ratio() >= cutoff:
+                score = sm.ratio()
+                if score >= cutoff:
+                    scored.append((score, slug))
+        scored.sort(reverse=True)
+        return [(slug, score) for score, slug in scored[:n]]
+
+    def best_match(self, query, cutoff=0.7):
+        found = self.best(query, n=1, cutoff=cutoff)
+        return found[0][0] if found else None
@@ -0,0 +1,176 @@
+import contextvars
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ==========================================
+# RUN INSTRUMENTATION
+# ==========================================
+REPORT_DIR = os.environ.get("RUN_REPORT_DIR", "scripts/.cache/reports")
+PROM_TEXTFILE = os.environ.get("PROM_TEXTFILE")   # e.g. node_exporter textfile collector path
+REPORT_KEEP = 50
+
+# Event kinds: http, genai, encode, json_io, wait (sleeps / rate limiter / backoff)
+_stage = contextvars.ContextVar("stage", default="main")
+_lock = threading.Lock()
+_series = {}        # (stage, kind) -> {count, errors, retries, rate_limited, bytes, latencies}
+_stages = {}        # stage -> wall seconds
+_started = time.time()
+
+def _get(kind, stage=None):
+    key = (stage or _stage.get(), kind)
+    s = _series.get(key)
+    if s is None:
+        s = _series[key] = {'count': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0, 'bytes': 0, 'latencies': []}
+    return s
+
+def record(kind, seconds=None, nbytes=0, error=None):
+    """One finished operation of `kind` in the current stage."""
+    if error is not None:
+        from fill_engine import is_quota_error   # Imported here: fill_engine imports metrics
+        limited = is_quota_error(error)
+    with _lock:
+        s = _get(kind)
+        s['count'] += 1
+        s['bytes'] += nbytes or 0
+        if seconds is not None: s['latencies'].append(seconds)
+        if error is not None:
+            s['errors'] += 1
+            if limited: s['rate_limited'] += 1
+
+def incr(kind, field, n=1):
+    """Bumps a counter (retries, rate_limited, ...) without an operation."""
+    with _lock:
+        _get(kind)[field] += n
+
+class _Op:
+    nbytes = 0
+    error = None
+
+@contextmanager
+def timed(kind):
+    """
+    with timed("http") as op: ...; op.nbytes = len(data)
+    Exceptions are counted as errors (429s as rate_limited) and re-raised.
+    """
+    op = _Op()
+    start = time.perf_counter()
+    try:
+        yield op
+    except Exception as e:
+        op.error = e
+        raise
+    finally:
+        record(kind, time.perf_counter() - start, op.nbytes, op.error)
+
+def sleep(seconds, kind="wait"):
+    """time.sleep that shows up in the report."""
+    if seconds <= 0: return
+    time.sleep(seconds)
+    record(kind, seconds)
+
+def record_response(resp, *args, **kwargs):
+    """requests response hook: latency to headers, body size, 429s."""
+    nbytes = int(resp.headers.get('Content-Length') or 0)
+    error = f"HTTP {resp.status_code}" if resp.status_code >= 400 else None
+    record("http", resp.elapsed.total_seconds(), nbytes, error)
+
+def instrument(session):
+    session.hooks['response'].append(record_response)
+    return session
+
+@contextmanager
+def stage(name):
+    """Attributes everything recorded inside (this thread / task) to `name`."""
+    token = _stage.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock: _stages[name] = _stages.get(name, 0.0) + time.perf_counter() - start
+        _stage.reset(token)
+
+def bind(fn):
+    """Wraps fn so pool threads record under the submitting thread's stage."""
+    ctx = contextvars.copy_context()
+    return lambda *a, **kw: ctx.copy().run(fn, *a, **kw)
+
+# ---------- Reports ----------
+def percentile(values, q):
+    """Nearest-rank percentile; None for no samples."""
+    if not values: return None
+    values = sorted(values)
+    return values[max(0, min(len(values), math.ceil(q / 100 * len(values))) - 1)]
+
+def report(name):
+    with _lock:
+        stages = {}
+        for (st, kind), s in sorted(_series.items()):
+            lat = s['latencies']
+            stages.setdefault(st, {'seconds': None, 'kinds': {}})['kinds'][kind] = {
+                'count': s['count'], 'errors': s['errors'], 'retries': s['retries'],
+                'rate_limited': s['rate_limited'], 'bytes': s['bytes'],
+                'total_ms': round(1000 * sum(lat), 1),
+                'p50_ms': round(1000 * percentile(lat, 50), 1) if lat else None,
+                'p95_ms': round(1000 * percentile(lat, 95), 1) if lat else None,
+            }
+        for st, seconds in _stages.items():
+            stages.setdefault(st, {'seconds': None, 'kinds': {}})['seconds'] = round(seconds, 3)
+    return {
+        'run': name,
+        'started': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(_started)),
+        'seconds': round(time.time() - _started, 3),
+        'argv': sys.argv[1:],
+        'stages': stages,
+    }
+
+def prometheus(rep):
+    """Prometheus text exposition of a report (node_exporter textfile format)."""
+    lines = [
+        "# HELP leagues_run_seconds Wall time of the last run.",
+        "# TYPE leagues_run_seconds gauge",
+        f'leagues_run_seconds{{run="{rep["run"]}"}} {rep["seconds"]}',
+        "# HELP leagues_stage_seconds Wall time per stage.",
+        "# TYPE leagues_stage_seconds gauge",
+    ]
+    for st, data in rep['stages'].items():
+        if data['seconds'] is not None:
+            lines.append(f'leagues_stage_seconds{{run="{rep["run"]}",stage="{st}"}} {data["seconds"]}')
+    for field in ('count', 'errors', 'retries', 'rate_limited', 'bytes', 'p50_ms', 'p95_ms'):
+        lines.append(f"# TYPE leagues_op_{field} gauge")
+        for st, data in rep['stages'].items():
+            for kind, k in data['kinds'].items():
+                if k[field] is not None:
+                    lines.append(f'leagues_op_{field}{{run="{rep["run"]}",stage="{st}",kind="{kind}"}} {k[field]}')
+    return "\n".join(lines) + "\n"
+
+def write_report(name, report_dir=REPORT_DIR, prom_file=PROM_TEXTFILE):
+    """Writes <report_dir>/<name>-<stamp>.json (and the textfile if configured)."""
+    rep = report(name)
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(_started))
+    path = os.path.join(report_dir, f"{name}-{stamp}.json")
+    with open(path, 'w') as f: json.dump(rep, f, indent=1)
+
+    old = sorted(p for p in os.listdir(report_dir) if p.startswith(f"{name}-"))
+    for p in old[:-REPORT_KEEP]: os.remove(os.path.join(report_dir, p))
+
+    if prom_file:
+        tmp = prom_file + ".tmp"   # Atomic: the collector never reads a partial file
+        with open(tmp, 'w') as f: f.write(prometheus(rep))
+        os.replace(tmp, prom_file)
+    return path
+
+@contextmanager
+def run(name):
+    """Wraps a script's main(): one stage, one report at exit."""
+    try:
+        with stage(name):
+            yield
+    finally:
+        path = write_report(name)
+        print(f"--- Run report: {path} ---")
@@ -0,0 +1,114 @@
+import json
+import re
+
+# ==========================================
+# TOLERANT MODEL OUTPUT PARSING
+# ==========================================
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+def chunk_text(chunk):
+    """Text of one streamed response chunk, unstripped: chunks split mid-word."""
+    try:
+        return chunk.text or ""
+    except Exception:
+        return ""
+
+def stream_text(client, model, prompt):
+    """Text chunks of generate_content_stream as they arrive."""
+    for chunk in client.models.generate_content_stream(model=model, contents=prompt):
+        yield chunk_text(chunk)
+
+def _loads(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(TRAILING_COMMA.sub(r"\1", text))
+    except ValueError:
+        return None
+
+class ObjectStream:
+    """
+    The top-level JSON objects of model output arriving as text chunks,
+    each yielded as soon as its closing brace arrives: the elements of
+    a list, or one bare object. Prose and code fences around them are
+    ignored.
+
+    An element that does not parse is skipped and scanning resumes at
+    the next one, so one bad row never costs the rest. .skipped counts
+    elements lost that way or cut off at the end; .complete is True once
+    the list (or bare object) was closed.
+    """
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.skipped = 0
+        self.complete = False
+
+    @property
+    def clean(self):
+        """Every element arrived and parsed."""
+        return self.complete and not self.skipped
+
+    def __iter__(self):
+        buf, i = "", 0
+        stack = []          # Open '[' / '{' outside strings
+        base = 0            # Stack depth elements start at: 1 inside the list
+        start = None        # buf index of the element being read
+        in_str = esc = False
+        last = ""           # Last significant character outside strings
+
+        def drop():
+            nonlocal start, in_str, esc
+            del stack[base:]
+            start, in_str, esc = None, False, False
+            self.skipped += 1
+
+        for chunk in self._chunks:
+            buf += chunk
+            while i < len(buf):
+                c = buf[i]
+                if in_str:
+                    if esc: esc = False
+                    elif c == '\\': esc = True
+                    elif c == '"': in_str, last = False, '"'
+                    elif c == '\n': drop()          # Strings never span lines: broken element
+                elif c in ' \t\r\n':
+                    pass
+                elif c == '"':
+                    if stack: in_str = True
+                elif c == '[':
+                    if not stack: base = 1
+                    stack.append(c)
+                elif c == '{':
+                    if start is not None and stack[-1] == '{' and last in ',{':
+                        drop()                      # Previous element never closed
+                    if start is None and len(stack) == base and (base or not self.complete):
+                        start = i
+                    stack.append(c)
+                elif c in ']}':
+                    if not stack or stack[-1] != ('[' if c == ']' else '{'):
+                        if start is not None: drop()
+                    else:
+                        stack.pop()
+                        if len(stack) < base or (start is not None and len(stack) == base):
+                            if start is not None:
+                                item = _loads(buf[start:i + 1])
+                                start = None
+                                if isinstance(item, dict): yield item
+                                else: self.skipped += 1
+                            if not stack: self.complete = True
+                if not in_str and c not in ' \t\r\n': last = c
+                i += 1
+
+            # Keep only the element still being read
+            cut = start if start is not None else i
+            buf, i = buf[cut:], i - cut
+            if start is not None: start = 0
+
+        if start is not None: self.skipped += 1
+
+def parse_objects(text):
+    """(objects, stream) for a whole reply; see ObjectStream."""
+    stream = ObjectStream([text or ""])
+    return list(stream), stream
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+import time
+
+import metrics
+from persist import locked, atomic_write
+
+# ==========================================
+# CACHED MODEL CAPABILITY RECORD
+# ==========================================
+REGISTRY_FILE = "scripts/.cache/models.json"
+MODEL_TTL = 7 * 24 * 3600   # Re-trust the preferred model after this
+
+# Stable -> Specific -> Pro
+CANDIDATES = [
+    'gemini-1.5-flash',
+    'gemini-1.5-flash-001',
+    'gemini-1.5-flash-002',
+    'gemini-1.5-flash-8b',
+    'gemini-1.5-pro',
+    'gemini-1.0-pro'
+]
+
+def is_not_found(error):
+    error = str(error)
+    return "404" in error or "NOT_FOUND" in error
+
+def key_fingerprint(api_key):
+    """Registry key per API key. The key itself is never written to disk."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+class ModelSelector:
+    """
+    Working model per API key, remembered with an expiry.
+
+    No pre-flight pings: the first real request uses the remembered (or
+    first) candidate. A 404 on a real request marks that model dead until
+    the TTL runs out and moves to the next candidate.
+    """
+    def __init__(self, api_key, candidates=CANDIDATES, path=REGISTRY_FILE, ttl=MODEL_TTL):
+        self.key = key_fingerprint(api_key)
+        self.candidates = list(candidates)
+        self.path = path
+        self.ttl = ttl
+        self._confirmed = None
+        self._lock = threading.Lock()
+
+        registry = self._load()
+        now = time.time()
+        rec = registry.get(self.key) or {}
+        self.dead = {m: t for m, t in (rec.get('dead') or {}).items() if t > now}
+        self.model = rec.get('model') if rec.get('expires', 0) > now else None
+        if self.model not in self.candidates or self.model in self.dead:
+            self.model = self._next_alive()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f: return json.load(f)
+        except: return {}
+
+    def _save(self):
+        with locked(self.path):   # Other keys' records are re-read, never overwritten
+            registry = self._load()
+            registry[self.key] = {'model': self.model, 'expires': time.time() + self.ttl, 'dead': self.dead}
+            atomic_write(self.path, json.dumps(registry, indent=1))
+
+    def _next_alive(self):
+        for m in self.candidates:
+            if m not in self.dead: return m
+        return self.candidates[0]
+
+    def failed(self, model, error):
+        """
+        Reports a failed real request. On 404 the model is retired and the
+        next candidate chosen. Returns True if the caller should retry
+        with self.model.
+        """
+        if not is_not_found(error): return False
+        with self._lock:
+            if model != self.model: return True   # Another thread already switched
+            self.dead[model] = time.time() + self.ttl
+            self.model = self._next_alive()
+            self._save()
+            print(f"   ❌ {model}: Not Found. Switching to {self.model}")
+            return self.model not in self.dead
+
+    def succeeded(self, model):
+        """Remembers model as working for this key (written once per run)."""
+        with self._lock:
+            if self._confirmed == model: return
+            self._confirmed = model
+            self.model = model
+            self._save()
+
+def generate(client, models, prompt):
+    """
+    generate_content with the selected model, falling through to the next
+    candidate on 404. Returns (response, model_used).
+    """
+    while True:
+        model = models.model
+        try:
+            with metrics.timed("genai"):
+                response = client.models.generate_content(model=model, contents=prompt)
+        except Exception as e:
+            if models.failed(model, e):
+                metrics.incr("genai", "retries")
+                continue
+            raise
+        models.succeeded(model)
+        return response, model
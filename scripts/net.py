@@ -0,0 +1,55 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# ==========================================
+# SHARED HTTP HELPERS
+# ==========================================
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+}
+
+def make_session(pool_size=16, headers=None, instrument=True):
+    """
+    One keep-alive Session with a connection pool big enough
+    for every worker thread that shares it. Pass instrument=False
+    when the caller records its own http metrics.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers or DEFAULT_HEADERS)
+    return metrics.instrument(session) if instrument else session
+
+class HostRateLimiter:
+    """
+    Spaces requests to the same host at least 1/rate seconds apart.
+    Threads reserve a slot under the lock and sleep outside it,
+    so different hosts never wait on each other.
+    """
+    def __init__(self, default_rate=5.0, rates=None):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        rate = self.rates.get(host, self.default_rate)
+        if not rate: return
+        interval = 1.0 / rate
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval
+
+        delay = slot - now
+        metrics.sleep(delay)
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None    # Windows: msvcrt below
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+import metrics
+
+# ==========================================
+# CRASH-SAFE SHARED FILES
+# ==========================================
+LOCK_TIMEOUT = 120      # Seconds to wait for another stage's lock
+LOCK_POLL = 0.05
+
+class CorruptFile(Exception):
+    """The file exists but cannot be parsed. Never treated as empty."""
+
+class LockTimeout(Exception):
+    pass
+
+_held = {}              # abs path -> (owner thread id, depth)
+_held_lock = threading.Condition()
+
+def _try_lock(f):
+    if fcntl:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+    if msvcrt:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    return True
+
+def _unlock(f):
+    if fcntl: fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    elif msvcrt:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def locked(path, timeout=LOCK_TIMEOUT):
+    """
+    Exclusive advisory lock for `path` (held on path + ".lock"), across
+    processes and threads. Re-entrant within one thread.
+    """
+    key, me = os.path.abspath(path), threading.get_ident()
+    start = time.perf_counter()
+    with _held_lock:
+        while key in _held and _held[key][0] != me:
+            if not _held_lock.wait(timeout - (time.perf_counter() - start)):
+                raise LockTimeout(path)
+        owner, depth = _held.get(key, (me, 0))
+        _held[key] = (me, depth + 1)
+    if depth:
+        try: yield
+        finally: _release(key)
+        return
+
+    try:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        f = open(key + ".lock", 'a+')
+    except Exception:
+        _release(key)
+        raise
+    try:
+        while not _try_lock(f):
+            if time.perf_counter() - start > timeout: raise LockTimeout(path)
+            time.sleep(LOCK_POLL)
+        waited = time.perf_counter() - start
+        if waited > LOCK_POLL: metrics.record("wait", waited)
+        try: yield
+        finally: _unlock(f)
+    finally:
+        f.close()
+        _release(key)
+
+def _release(key):
+    with _held_lock:
+        owner, depth = _held[key]
+        if depth > 1: _held[key] = (owner, depth - 1)
+        else: del _held[key]
+        _held_lock.notify_all()
+
+def atomic_write(path, data, skip_unchanged=False):
+    """
+    Replaces path with data (str or bytes) via fsynced temp file + rename,
+    so readers see the old or the new content, never a truncated file.
+    Returns False if skip_unchanged and the content is already there.
+    """
+    if isinstance(data, str): data = data.encode('utf-8')
+    if skip_unchanged:
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == data: return False
+        except OSError:
+            pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with metrics.timed("json_io") as op:
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+        op.nbytes = len(data)
+    return True
+
+def read_json(path, default=None):
+    """Parsed file, default if it does not exist; CorruptFile if it cannot be parsed."""
+    try:
+        with metrics.timed("json_io") as op, open(path, 'rb') as f:
+            data = f.read()
+            op.nbytes = len(data)
+    except FileNotFoundError:
+        return default
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise CorruptFile(f"{path}: {e}") from None
+
+def write_json(path, obj, skip_unchanged=False, **dump_kwargs):
+    """Atomic, locked json.dump. Returns True if written."""
+    with locked(path):
+        return atomic_write(path, json.dumps(obj, **dump_kwargs), skip_unchanged)
+
+def merge_dicts(base, theirs, mine):
+    """
+    Three-way merge of dict files: keys this writer changed or deleted
+    since reading `base` take its value; every other key keeps `theirs`.
+    """
+    merged = dict(theirs)
+    for k in set(base) | set(mine):
+        if k in mine and mine[k] != base.get(k):
+            merged[k] = mine[k]
+        elif k not in mine and k in base:
+            merged.pop(k, None)
+    return merged
+
+def save_merged(path, base, mine, merge=merge_dicts, **dump_kwargs):
+    """
+    Compare-and-swap save of a dict file read earlier as `base`: if
+    nobody wrote it since, mine is written as is; otherwise
+    merge(base, theirs, mine) is. Unreadable files count as empty.
+    Returns what was written (the caller's next base).
+    """
+    with locked(path):
+        try: theirs = read_json(path, {})
+        except CorruptFile: theirs = {}
+        result = mine if theirs == base else merge(base, theirs, mine)
+        atomic_write(path, json.dumps(result, **dump_kwargs))
+    return result
+
+class JsonState:
+    """
+    A { key: entry } cache file shared by threads: loaded once, saved once
+    at the end of a run, merged with entries another run saved meanwhile.
+    Unreadable files count as empty (a cache is rebuilt). Subclasses change
+    self.entries under self._lock and set self.dirty.
+    """
+    def __init__(self, path):
+        self.path = path
+        try: self.entries = read_json(path, {})
+        except CorruptFile: self.entries = {}
+        self._base = dict(self.entries)
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self):
+        """Merges with entries another run saved meanwhile."""
+        if not self.dirty: return
+        with self._lock:
+            self._base = save_merged(self.path, self._base, self.entries, indent=1, sort_keys=True)
+            self.entries = dict(self._base)
+            self.dirty = False
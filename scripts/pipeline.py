@@ -0,0 +1,176 @@
+import asyncio
+import json
+import sys
+import time
+
+from team_store import TeamStore
+from snapshot import load_feed, refresh_requested, COUNTRIES
+from badge_cache import BadgeManifest, FailureCache
+from asset_store import AssetStore
+from verify_scheduler import VerificationState
+import fetch_teams
+import fetch_tsdb
+import fetch_streamed
+import fill_leagues
+import verify_leagues
+import generate_map
+import export_bundles
+import metrics
+from persist import write_json
+
+# ==========================================
+# ASYNC PIPELINE RUNNER
+# ==========================================
+SETTINGS_FILE = 'settings.json'
+
+class StageSkipped(Exception):
+    pass
+
+class Stage:
+    """A named step; fn(ctx, results) runs once every stage in deps has succeeded."""
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+def check_dag(stages):
+    """Raises ValueError on unknown dependencies or cycles."""
+    names = {s.name for s in stages}
+    for s in stages:
+        missing = set(s.deps) - names
+        if missing: raise ValueError(f"{s.name}: unknown deps {sorted(missing)}")
+    done, pending = set(), list(stages)
+    while pending:
+        ready = [s for s in pending if set(s.deps) <= done]
+        if not ready: raise ValueError(f"cycle among {[s.name for s in pending]}")
+        done |= {s.name for s in ready}
+        pending = [s for s in pending if s.name not in done]
+
+def in_stage(stage, ctx, results):
+    with metrics.stage(stage.name):
+        return stage.fn(ctx, results)
+
+async def run_dag(stages, ctx):
+    """
+    Runs every stage as soon as its deps finish. Stage bodies are blocking
+    code, so each runs in a worker thread; independent stages overlap.
+    Returns (results, timings) where timings[name] = (start, seconds, status).
+    """
+    check_dag(stages)
+    t0 = time.perf_counter()
+    results, timings, tasks = {}, {}, {}
+
+    async def run(stage):
+        for dep in stage.deps:
+            try: await tasks[dep]
+            except Exception: pass
+        failed = [d for d in stage.deps if timings[d][2] != "ok"]
+        start = time.perf_counter() - t0
+        if failed:
+            timings[stage.name] = (start, 0.0, f"skipped ({', '.join(failed)})")
+            raise StageSkipped(stage.name)
+        try:
+            results[stage.name] = await asyncio.to_thread(in_stage, stage, ctx, results)
+            timings[stage.name] = (start, time.perf_counter() - t0 - start, "ok")
+        except Exception as e:
+            timings[stage.name] = (start, time.perf_counter() - t0 - start, f"failed: {str(e)[:80]}")
+            raise
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run(stage))
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return results, timings
+
+# ==========================================
+# STAGES
+# ==========================================
+def stage_feeds(ctx, results):
+    """
+    Every feed, downloaded once and shared in memory: the teams stage gets
+    all of it, the logo stages the matches of the regional feeds.
+    """
+    teams_feed = load_feed(fetch_teams.FEED_COUNTRIES, refresh=refresh_requested(), timeout=20)
+    if teams_feed is None: raise RuntimeError("backend down and no snapshot")
+    matches = [m for m in teams_feed if m.get('region') in COUNTRIES]
+    return {'teams': teams_feed, 'matches': matches}
+
+def stage_teams(ctx, results):
+    return fetch_teams.sync_teams(ctx['store'], results['feeds']['teams'])
+
+def stage_tsdb(ctx, results):
+    return fetch_tsdb.harvest(ctx['badges'], ctx['logos'], ctx['refresh'])
+
+def stage_fill(ctx, results):
+    return fill_leagues.fill(ctx['store'], ctx['settings'], league_map=results['tsdb'])
+
+def stage_verify(ctx, results):
+    if not ctx['settings'].get("enable_verification", False): return 0
+    return verify_leagues.verify(ctx['store'], ctx['settings'], ctx['verification'])
+
+def stage_streamed(ctx, results):
+    return fetch_streamed.fill_gaps(results['feeds']['matches'], ctx['badges'], ctx['logos'], ctx['refresh'],
+                                    ctx['badge_failures'], league_map=results['tsdb'])
+
+def stage_map(ctx, results):
+    return generate_map.build_map(results['feeds']['matches'], full=ctx['full'], league_map=results['tsdb'],
+                                  store=ctx['logos'])
+
+STAGES = [
+    Stage("feeds", stage_feeds),
+    Stage("tsdb", stage_tsdb),
+    Stage("teams", stage_teams, deps=["feeds"]),
+    Stage("fill", stage_fill, deps=["teams", "tsdb"]),
+    Stage("verify", stage_verify, deps=["fill"]),
+    Stage("streamed", stage_streamed, deps=["feeds", "tsdb"]),
+    Stage("map", stage_map, deps=["feeds", "tsdb", "streamed"]),
+]
+
+def save_outputs(ctx, results):
+    """Every shared file is written once, after all stages finished."""
+    ctx['badges'].save()
+    ctx['badge_failures'].save()
+    ctx['logos'].gc()
+    ctx['logos'].save()
+    if 'tsdb' in results:
+        write_json(fetch_tsdb.LEAGUE_MAP_FILE, results['tsdb'], indent=2)
+    if 'map' in results:
+        generate_map.save_map(*results['map'])
+    if 'verify' in results:
+        ctx['verification'].save()
+    return ctx['store'].export()
+
+def report(timings, total):
+    print(f"--- Pipeline finished in {total:.1f}s ---")
+    for name, (start, seconds, status) in sorted(timings.items(), key=lambda x: x[1][0]):
+        print(f"   {name:<10} start {start:7.2f}s  took {seconds:7.2f}s  {status}")
+
+def main():
+    try:
+        with open(SETTINGS_FILE, 'r') as f: settings = json.load(f)
+    except: settings = {}
+
+    ctx = {
+        'settings': settings,
+        'store': TeamStore(),
+        'badges': BadgeManifest(),
+        'badge_failures': FailureCache(),
+        'logos': AssetStore(),
+        'verification': VerificationState(),
+        'refresh': "--refresh" in sys.argv,
+        'full': "--full" in sys.argv,
+    }
+    print(f"--- Pipeline: {len(STAGES)} stages ---")
+
+    start = time.perf_counter()
+    results, timings = asyncio.run(run_dag(STAGES, ctx))
+    with metrics.stage("save"):
+        if save_outputs(ctx, results):
+            print(" > Database Updated.")
+    with metrics.stage("export"):
+        manifest = export_bundles.export()
+        print(f" > Bundles v{manifest['version']} ({len(manifest['shards'])} shards)")
+    report(timings, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    with metrics.run("pipeline"):
+        main()
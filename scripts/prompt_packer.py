@@ -0,0 +1,99 @@
+import json
+
+from identity import team_key
+
+# ==========================================
+# TOKEN-BUDGETED PROMPT PACKING
+# ==========================================
+INPUT_BUDGET = 6000     # Estimated prompt tokens per request, template included
+OUTPUT_BUDGET = 3000    # Estimated answer tokens per request
+ANSWER_TOKENS = 16      # One {"id": n, "League": "..."} answer
+MAX_ROWS = 150          # Rows per request, whatever the budgets allow
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(obj):
+    """Rough token count (~4 characters each) of a string or JSON-able object."""
+    text = obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False)
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _line(values):
+    return json.dumps(values, ensure_ascii=False, separators=(',', ':'))
+
+def encode_rows(columns, items):
+    """
+    Items as a table: the header once, then one row per item, numbered from 1.
+      ["id","Team","Sport"]
+      [1,"Arsenal","soccer"]
+    """
+    lines = [_line(["id", *columns])]
+    for i, item in enumerate(items, 1):
+        lines.append(_line([i, *(item.get(c) or "" for c in columns)]))
+    return "\n".join(lines)
+
+def row_index(value, size):
+    """0-based index of a 1-based row id as the model wrote it (3, "3"); None if unusable."""
+    if isinstance(value, bool): return None
+    try: i = int(str(value).strip())
+    except (TypeError, ValueError): return None
+    return i - 1 if 1 <= i <= size else None
+
+class PromptPacker:
+    """
+    Renders items into prompt_template's {batch_data} as an id-numbered
+    table, packing each request up to the input budget and to as many
+    rows as the output budget can answer (answer_tokens each).
+    """
+    def __init__(self, template, columns, input_budget=INPUT_BUDGET, output_budget=OUTPUT_BUDGET,
+                 answer_tokens=ANSWER_TOKENS, max_rows=MAX_ROWS):
+        self.template = template or ""
+        self.columns = tuple(columns)
+        self.input_budget = input_budget
+        self.max_rows = max(1, min(max_rows, output_budget // answer_tokens))
+        self._overhead = estimate_tokens(self.template.replace("{batch_data}", "")) + \
+                         estimate_tokens(_line(["id", *self.columns]))
+
+    def row_tokens(self, item):
+        return estimate_tokens(_line([self.max_rows, *(item.get(c) or "" for c in self.columns)]) + "\n")
+
+    def pack(self, items):
+        """Greedy in-order batches; an item too large for any budget still gets its own."""
+        batches, current, used = [], [], self._overhead
+        for item in items:
+            cost = self.row_tokens(item)
+            if current and (used + cost > self.input_budget or len(current) >= self.max_rows):
+                batches.append(current)
+                current, used = [], self._overhead
+            current.append(item)
+            used += cost
+        if current: batches.append(current)
+        return batches
+
+    def render(self, batch):
+        return self.template.replace("{batch_data}", encode_rows(self.columns, batch))
+
+    def tokens(self, batch):
+        return self._overhead + sum(self.row_tokens(item) for item in batch)
+
+    def match(self, batch, answers):
+        """
+        { row index: answer } for the answers to one rendered batch. Answers
+        are matched by "id"; ones without a usable id fall back to the
+        echoed Team name (prompts that predate row ids). First answer wins.
+        """
+        by_name = {}
+        for i, item in enumerate(batch):
+            key = team_key(item.get('Team'))
+            if key: by_name.setdefault(key, i)
+        matched = {}
+        for ans in answers or []:
+            if not isinstance(ans, dict): continue
+            i = row_index(ans.get('id'), len(batch))
+            if i is None: i = by_name.get(team_key(ans.get('Team')))
+            if i is not None: matched.setdefault(i, ans)
+        return matched
+
+def from_settings(settings, prompt_key, columns, **kwargs):
+    """Packer for settings[prompt_key], budgets from input/output_token_budget when set."""
+    return PromptPacker(settings.get(prompt_key, ""), columns,
+                        input_budget=settings.get("input_token_budget", INPUT_BUDGET),
+                        output_budget=settings.get("output_token_budget", OUTPUT_BUDGET), **kwargs)
@@ -0,0 +1,246 @@
+import codecs
+import glob
+import gzip
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+import requests
+
+import metrics
+from net import make_session
+
+# ==========================================
+# SHARED SYNC-NODES SNAPSHOT CACHE
+# ==========================================
+SYNC_NODES_URL = os.environ.get("SYNC_NODES_URL", "https://vercelapi-olive.vercel.app/api/sync-nodes")
+# Regional feeds fetched side by side, e.g. SYNC_COUNTRIES=us,gb,de
+COUNTRIES = [c.strip() for c in os.environ.get("SYNC_COUNTRIES", "us").split(",") if c.strip()]
+BACKEND_TIMEOUT = 15
+SNAPSHOT_DIR = "scripts/.cache/sync_nodes"
+SNAPSHOT_TTL = 15 * 60   # Seconds a snapshot is served without re-fetching
+SNAPSHOT_KEEP = 5        # Snapshots kept per URL (fallbacks)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "Accept": "application/json"
+}
+
+def country_url(country):
+    """Feed URL for one country; "" is the unfiltered feed."""
+    return f"{SYNC_NODES_URL}?country={country}" if country else SYNC_NODES_URL
+
+def _key(url):
+    return hashlib.sha1(url.encode()).hexdigest()[:12]
+
+def _snapshots(url):
+    """Snapshot paths for url, newest first."""
+    return sorted(glob.glob(os.path.join(SNAPSHOT_DIR, f"{_key(url)}-*.json.gz")), reverse=True)
+
+class FeedUnavailable(Exception):
+    pass
+
+ARRAY_START = r'"%s"\s*:\s*\['
+CHUNK_SIZE = 64 * 1024
+
+def iter_json_array(chunks, key="matches"):
+    """
+    Yields the items of the array under `key` from a JSON document that
+    arrives as byte chunks, each as soon as it is complete. Only the
+    item being parsed is held in memory, never the whole document.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    start = re.compile(ARRAY_START % re.escape(key))
+    buf, pos, inside = "", 0, False
+
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        if not inside:
+            found = start.search(buf)
+            if not found:
+                buf = buf[-(len(key) + 64):]   # Keep a tail: the key may straddle chunks
+                continue
+            pos, inside = found.end(), True
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,': pos += 1
+            if pos >= len(buf): break
+            if buf[pos] == ']': return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break                          # Incomplete item: wait for more bytes
+            pos = end
+            yield item
+
+    if inside: raise ValueError("truncated JSON array")
+
+def _file_chunks(path):
+    with gzip.open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk: return
+            yield chunk
+
+def _stream_and_record(url, timeout, session=None):
+    """Yields response chunks while teeing them into a new gzipped snapshot."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    path = os.path.join(SNAPSHOT_DIR, f"{_key(url)}-{stamp}.json.gz")
+    tmp = path + ".tmp"
+    waited, nbytes, error = 0.0, 0, None   # Network time only, not the consumer's
+    try:
+        start = time.perf_counter()
+        with (session or requests).get(url, headers=HEADERS, timeout=timeout, stream=True) as resp:
+            resp.raise_for_status()
+            with gzip.open(tmp, 'wb') as out:
+                for chunk in resp.iter_content(CHUNK_SIZE):
+                    waited += time.perf_counter() - start
+                    nbytes += len(chunk)
+                    out.write(chunk)
+                    yield chunk
+                    start = time.perf_counter()
+        os.replace(tmp, path)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        metrics.record("http", waited, nbytes, error)
+        if os.path.exists(tmp): os.remove(tmp)
+
+    for old in _snapshots(url)[SNAPSHOT_KEEP:]:
+        os.remove(old)
+
+def iter_matches(url, refresh=False, ttl=SNAPSHOT_TTL, timeout=BACKEND_TIMEOUT, session=None):
+    """
+    Streams the sync-nodes match list: each match is yielded while the
+    body is still downloading, and the raw body is kept as the new snapshot.
+
+    A snapshot younger than ttl is streamed from disk instead. If the
+    backend fails, the last good snapshot is streamed; when that happens
+    mid-download, matches already yielded may repeat, so consumers must be
+    idempotent (every current one is). Raises FeedUnavailable when neither
+    the backend nor a snapshot is available.
+    """
+    snaps = _snapshots(url)
+    if snaps and not refresh and time.time() - os.path.getmtime(snaps[0]) < ttl:
+        try:
+            yield from iter_json_array(_file_chunks(snaps[0]))
+            return
+        except Exception:
+            pass
+
+    try:
+        yield from iter_json_array(_stream_and_record(url, timeout, session))
+        return
+    except Exception as e:
+        print(f" [!] Backend unavailable: {e}")
+
+    for path in snaps:
+        try:
+            matches = iter_json_array(_file_chunks(path))
+            first = next(matches, None)
+        except Exception:
+            continue
+        print(f" > Using last good snapshot: {os.path.basename(path)}")
+        if first is not None:
+            yield first
+            yield from matches
+        return
+    raise FeedUnavailable(url)
+
+# ---------- Country fan-out ----------
+_DONE = object()
+
+def match_key(m):
+    return (m.get('team_a'), m.get('team_b'), m.get('sport'))
+
+def _put(out, item, stop):
+    """Blocking put that gives up once the consumer has stopped reading."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _pump(country, out, stop, failed, session, refresh, ttl, timeout):
+    try:
+        for m in iter_matches(country_url(country), refresh, ttl, timeout, session):
+            if not _put(out, (country, m), stop): return
+    except FeedUnavailable:
+        failed.append(country)
+    finally:
+        _put(out, (country, _DONE), stop)
+
+def iter_feed(countries=None, refresh=False, ttl=SNAPSHOT_TTL, timeout=BACKEND_TIMEOUT):
+    """
+    Streams the matches of every country feed at once, one thread per
+    country over a shared keep-alive session, so the whole fan-out takes
+    about as long as the slowest feed. A match seen in several feeds is
+    yielded once, tagged with the first region that delivered it. If the
+    unfiltered feed ("") delivered it first, the tag is added when a
+    regional copy arrives, after the yield: consumers that collect the
+    whole feed (load_feed) always see it.
+
+    Each country falls back to its own snapshot; FeedUnavailable is
+    raised only when no country produced anything.
+    """
+    countries = list(dict.fromkeys(COUNTRIES if countries is None else countries))
+    session = make_session(pool_size=len(countries), headers=HEADERS, instrument=False)
+    out = queue.Queue(maxsize=1024)
+    stop = threading.Event()
+    failed = []
+    workers = [
+        threading.Thread(target=metrics.bind(_pump), daemon=True,
+                         args=(c, out, stop, failed, session, refresh, ttl, timeout))
+        for c in countries
+    ]
+    for w in workers: w.start()
+
+    seen, running = set(), len(workers)
+    untagged = {}   # Matches yielded from the unfiltered feed, awaiting a region
+    try:
+        while running:
+            country, m = out.get()
+            if m is _DONE:
+                running -= 1
+                continue
+            key = match_key(m)
+            if key in seen:
+                if country and key in untagged: untagged.pop(key)['region'] = country
+                continue
+            seen.add(key)
+            if country: m['region'] = country
+            else: untagged[key] = m
+            yield m
+    finally:
+        stop.set()
+        session.close()
+
+    if failed:
+        print(f" [!] No data for: {', '.join(c or 'global' for c in failed)}")
+    if len(failed) == len(countries):
+        raise FeedUnavailable(", ".join(countries))
+
+def load_feed(countries=None, refresh=False, ttl=SNAPSHOT_TTL, timeout=BACKEND_TIMEOUT):
+    """iter_feed as a list, or None if no country is available."""
+    try:
+        return list(iter_feed(countries, refresh, ttl, timeout))
+    except FeedUnavailable:
+        return None
+
+def refresh_requested():
+    return "--refresh-backend" in sys.argv
+
+if __name__ == "__main__":
+    matches = load_feed(refresh=True)
+    print(f"--- Snapshot: {len(matches) if matches is not None else 'no'} matches from {', '.join(COUNTRIES)} ---")
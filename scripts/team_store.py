@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from persist import locked, atomic_write, read_json
+from identity import team_key, scoped_key
+
+# ==========================================
+# INDEXED TEAM STORE (SQLite, db.json export)
+# ==========================================
+DB_FILE = 'db.json'
+STORE_FILE = 'scripts/teams.sqlite'
+KEY_VERSION = "2"   # Bump when the key scheme changes: the table is rebuilt from db.json
+
+# Record field -> column
+FIELDS = {"Team": "team", "Sport": "sport", "League": "league", "Status": "status"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    key    TEXT PRIMARY KEY,
+    name   TEXT NOT NULL,
+    seq    INTEGER NOT NULL,
+    team   TEXT NOT NULL,
+    sport  TEXT NOT NULL DEFAULT '',
+    league TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    extra  TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS teams_name   ON teams(name);
+CREATE INDEX IF NOT EXISTS teams_seq    ON teams(seq);
+CREATE INDEX IF NOT EXISTS teams_sport  ON teams(sport);
+CREATE INDEX IF NOT EXISTS teams_league ON teams(league);
+CREATE INDEX IF NOT EXISTS teams_status ON teams(status);
+CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+"""
+
+def _file_hash(path):
+    try:
+        with open(path, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+class TeamStore:
+    """
+    Teams keyed by scoped_key(Team, Sport) with a team_key(Team) index,
+    so "Rangers" can exist once per sport, plus secondary indexes on
+    Sport/League/Status. Rows whose keys collide on import are merged into
+    the first (see _merge_duplicate).
+    Every upsert/update touches one row; db.json is only rewritten by
+    export(), and only when something changed.
+
+    db.json stays the committed source of truth: if it changed since the
+    last import/export (e.g. a fresh checkout), the store re-imports it.
+    An unparsable db.json raises CorruptFile instead of reading as empty.
+    """
+    def __init__(self, path=STORE_FILE, json_path=DB_FILE):
+        self.json_path = json_path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        if self._meta("key_version") != KEY_VERSION:
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS teams")
+                self.conn.execute("DELETE FROM meta")
+                self._set_meta("key_version", KEY_VERSION)
+        self.conn.executescript(SCHEMA)
+        self._sync_from_json()
+
+    # ---------- meta ----------
+    def _meta(self, k, default=None):
+        row = self.conn.execute("SELECT v FROM meta WHERE k = ?", (k,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, k, v):
+        self.conn.execute("INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)", (k, str(v)))
+
+    def _bump(self):
+        self._set_meta("rev", int(self._meta("rev", 0)) + 1)
+
+    def _sync_from_json(self):
+        with locked(self.json_path):
+            digest = _file_hash(self.json_path)
+            if digest is None or digest == self._meta("json_hash"): return
+            records = read_json(self.json_path, [])
+
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM teams")
+            merged = 0
+            for rec in records:
+                if not self._insert(rec, ignore=True):
+                    self._merge_duplicate(rec)
+                    merged += 1
+            self._set_meta("json_hash", digest)
+            # Duplicates folded together: the next export rewrites db.json without them
+            self._set_meta("rev", 1 if merged else 0)
+            self._set_meta("exported_rev", 0)
+
+    # ---------- rows ----------
+    @staticmethod
+    def _to_record(row):
+        rec = {field: row[col] for field, col in FIELDS.items()}
+        rec.update(json.loads(row["extra"]))
+        return rec
+
+    def _insert(self, rec, ignore=False):
+        seq = self.conn.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM teams").fetchone()[0]
+        extra = {k: v for k, v in rec.items() if k not in FIELDS}
+        cur = self.conn.execute(
+            f"INSERT {'OR IGNORE ' if ignore else ''}INTO teams (key, name, seq, team, sport, league, status, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (scoped_key(rec["Team"], rec.get("Sport")), team_key(rec["Team"]), seq, rec["Team"],
+             rec.get("Sport") or "", rec.get("League") or "", rec.get("Status") or "", json.dumps(extra))
+        )
+        return cur.rowcount > 0
+
+    def _save(self, key, rec):
+        """Writes rec over the row at key (rec's own key may differ: re-keys it)."""
+        extra = {k: v for k, v in rec.items() if k not in FIELDS}
+        self.conn.execute(
+            "UPDATE teams SET key = ?, sport = ?, league = ?, status = ?, extra = ? WHERE key = ?",
+            (scoped_key(rec["Team"], rec["Sport"]), rec["Sport"] or "", rec["League"] or "",
+             rec["Status"] or "", json.dumps(extra), key)
+        )
+
+    def _merge_duplicate(self, rec):
+        """
+        Folds a db.json row whose key is already taken into the row kept.
+        The kept row's values win, except that a League (with its Status)
+        fills an empty League and other empty fields take rec's values.
+        """
+        key = scoped_key(rec["Team"], rec.get("Sport"))
+        kept = self._to_record(self.conn.execute("SELECT * FROM teams WHERE key = ?", (key,)).fetchone())
+        merged = dict(kept)
+        if not kept.get("League") and rec.get("League"):
+            merged.update(League=rec["League"], Status=rec.get("Status") or kept.get("Status"))
+        for k, v in rec.items():
+            if k not in ("Team", "Sport") and v not in (None, "") and merged.get(k) in (None, ""):
+                merged[k] = v
+        if merged != kept: self._save(key, merged)
+        print(f" [!] {self.json_path}: '{rec['Team']}' duplicates '{kept['Team']}' ({kept['Sport']}); merged into it")
+
+    # ---------- reads ----------
+    def _row(self, name, sport=None):
+        """Row for (name, sport); without sport, the first row with that name."""
+        if sport:
+            return self.conn.execute("SELECT * FROM teams WHERE key = ?", (scoped_key(name, sport),)).fetchone()
+        return self.conn.execute("SELECT * FROM teams WHERE name = ? ORDER BY seq LIMIT 1", (team_key(name),)).fetchone()
+
+    def get(self, name, sport=None):
+        with self._lock:
+            row = self._row(name, sport)
+        return self._to_record(row) if row else None
+
+    def __contains__(self, name):
+        with self._lock:
+            return self._row(name) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM teams").fetchone()[0]
+
+    def find(self, sport=None, league=None, status=None, limit=None):
+        """Records matching every given field, in db.json order."""
+        where, args = [], []
+        for col, val in (("sport", sport), ("league", league), ("status", status)):
+            if val is not None:
+                where.append(f"{col} = ?")
+                args.append(val)
+        sql = "SELECT * FROM teams"
+        if where: sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            return [self._to_record(r) for r in self.conn.execute(sql, args)]
+
+    def all(self):
+        return self.find()
+
+    # ---------- writes ----------
+    def add(self, rec):
+        """Inserts rec unless its team already exists. Returns True if added."""
+        with self._lock, self.conn:
+            added = self._insert(rec, ignore=True)
+            if added: self._bump()
+        return added
+
+    def upsert(self, rec):
+        """Inserts rec, or merges its fields into the existing record."""
+        with self._lock:
+            if self._row(rec["Team"], rec.get("Sport") or "Unknown"):
+                fields = {k: v for k, v in rec.items() if k not in ("Team", "Sport")}
+                return self.update(rec["Team"], sport=rec.get("Sport") or "Unknown", **fields)
+            return self.add(rec)
+
+    def update(self, name, sport=None, **fields):
+        """
+        Partial update of one record (the first with that name if sport is
+        not given). Returns True if anything changed.
+        """
+        with self._lock, self.conn:
+            row = self._row(name, sport)
+            if not row: return False
+
+            current = self._to_record(row)
+            changed = {k: v for k, v in fields.items() if current.get(k) != v}
+            if not changed: return False
+
+            current.update(changed)
+            self._save(row["key"], current)
+            self._bump()
+        return True
+
+    # ---------- export ----------
+    def dirty(self):
+        return self._meta("rev", "0") != self._meta("exported_rev", "0")
+
+    def _merge_external(self):
+        """
+        Compare-and-swap: if db.json was rewritten since our last import or
+        export (another stage, a pull), teams only it has are added first,
+        so exporting never drops them.
+        """
+        digest = _file_hash(self.json_path)
+        if digest is None or digest == self._meta("json_hash"): return
+        with self.conn:
+            added = sum(self._insert(rec, ignore=True) for rec in read_json(self.json_path, []))
+            if added: self._bump()
+            self._set_meta("json_hash", digest)
+
+    def export(self, path=None, force=False):
+        """
+        Writes the frontend db.json if anything changed, atomically and
+        under the file lock. Returns True if written.
+        """
+        path = path or self.json_path
+        with self._lock, locked(path):
+            if path == self.json_path: self._merge_external()
+            if not (force or self.dirty() or not os.path.exists(path)): return False
+            atomic_write(path, json.dumps(self.all(), indent=4))
+            with self.conn:
+                self._set_meta("exported_rev", self._meta("rev", 0))
+                if path == self.json_path:
+                    self._set_meta("json_hash", _file_hash(path))
+        return True
+
+    def close(self):
+        self.conn.close()
@@ -1,16 +1,23 @@
 import json
 import os
-import time
-import re
 from google import genai
 
+import metrics
+from team_store import TeamStore
+from ai_cache import AICache, partition
+from model_registry import ModelSelector, generate
+from fill_engine import AdaptiveTokenBucket, is_quota_error
+from verify_scheduler import VerificationState, due
+from prompt_packer import from_settings
+from model_output import parse_objects
+
 # CONFIG
 DB_FILE = 'db.json'
 SETTINGS_FILE = 'settings.json'
-CURSOR_FILE = 'scripts/verification_cursor.txt'
-BATCH_SIZE = 50       
 BATCHES_PER_RUN = 5   
-SLEEP_TIME = 15       
+SLEEP_TIME = 15       # Starting interval between requests (adapts on 429)
+VERIFY_COLUMNS = ("Team", "Sport", "League")
+MODELS = ['gemini-1.5-flash', 'gemini-1.5-flash-001', 'gemini-1.5-flash-002', 'gemini-1.5-pro']
 
 def get_text(response):
     try:
@@ -19,106 +26,91 @@ def get_text(response):
     except: pass
     return ""
 
-def clean_json(text):
-    if not text: return ""
-    text = re.sub(r"^```json|^```|```$", "", text, flags=re.MULTILINE).strip()
-    return text
+def verify(store, settings, state):
+    """Audits the most overdue records, updating store and state in place."""
+    api_key = os.environ.get("GEMINI_KEY_VERIFICATION")
+
+    # 1. Pick the records most likely to be wrong
+    queue = due(store.all(), state)
+    print(f" > {len(queue)} records due for verification")
+
+    client = genai.Client(api_key=api_key)
+    # Remembered working model for this key (no pre-flight pings)
+    models = ModelSelector(api_key, candidates=MODELS)
+    print(f" > Using Model: {models.model}")
+    
+    packer = from_settings(settings, "verification_prompt", VERIFY_COLUMNS)
+    prompt_template = packer.template
+    cache = AICache("verify")
+    bucket = AdaptiveTokenBucket(rate=1 / SLEEP_TIME, capacity=1)
+
+    def apply_fix(item, correct_league):
+        rec = store.get(item["Team"], item["Sport"])
+        if rec and correct_league and rec['League'] != correct_league:
+            print(f"     ⚠️ Correction: {item['Team']} -> {correct_league}")
+            store.update(item["Team"], item["Sport"], League=correct_league, Status="Modified")
+            return True
+        return False
+
+    # New or changed records already answered are served from cache. Records
+    # due only because their audit aged always go back to the model: a cache
+    # hit is no fresh audit and must not refresh them or raise confidence
+    payload = [{"Team": t['Team'], "League": t['League'], "Sport": t['Sport']} for t in queue]
+    aged = [state.audited(item) for item in payload]
+    cached, fresh = partition(cache, models.model, prompt_template,
+                              [item for item, old in zip(payload, aged) if not old])
+    fresh = {id(item) for item in fresh}
+    payload = [item for item, old in zip(payload, aged) if old or id(item) in fresh]
+    for item, correct_league in cached:
+        corrected = apply_fix(item, correct_league)
+        state.mark(item["Team"], item["Sport"], store.get(item["Team"], item["Sport"])['League'], corrected)
 
-def find_working_model(client):
-    candidates = ['gemini-1.5-flash', 'gemini-1.5-flash-001', 'gemini-1.5-flash-002', 'gemini-1.5-pro']
-    for model in candidates:
+    # 2. Run Batches (packed to the token budget, highest priority first)
+    batches = packer.pack(payload)[:BATCHES_PER_RUN]
+    for i, batch in enumerate(batches):
+        print(f"   Batch {i+1}: Checking {len(batch)} teams...")
+        bucket.acquire()
         try:
-            res = client.models.generate_content(model=model, contents="Hi")
-            if res: return model
-        except: pass
-    return 'gemini-1.5-flash'
+            response, model_name = generate(client, models, packer.render(batch))
+            bucket.reward()
+            
+            corrections, reply = parse_objects(get_text(response))
+            if not reply.clean:
+                print(f"     [!] Partial reply: {len(corrections)} corrections kept, {reply.skipped} lost")
+
+            # Corrections name their row id; unlisted rows were confirmed,
+            # unless part of the reply was lost: those wait for the next run
+            fixes = packer.match(batch, corrections)
+            for row, item in enumerate(batch):
+                if row not in fixes and not reply.clean: continue
+                correct_league = fixes.get(row, {}).get("League")
+                cache.put(model_name, prompt_template, item, correct_league)
+                corrected = apply_fix(item, correct_league)
+                state.mark(item["Team"], item["Sport"], store.get(item["Team"], item["Sport"])['League'], corrected)
+        except Exception as e:
+            print(f"     [!] Batch Failed: {str(e)[:100]}")
+            if is_quota_error(e): bucket.throttle(60)
+
+    cache.evict()
+    print(f" > {len(cached)} answered from cache, {len(batches)} requests. {cache.summary()}")
+    return len(batches)
 
 def main():
     print("--- [Phase 3] Starting Rolling Verification ---")
 
-    api_key = os.environ.get("GEMINI_KEY_VERIFICATION")
-    
     try:
         with open(SETTINGS_FILE, 'r') as f: settings = json.load(f)
         if not settings.get("enable_verification", False): return
-        with open(DB_FILE, 'r') as f: db = json.load(f)
     except: return
+    store = TeamStore(json_path=DB_FILE)
+    state = VerificationState()
 
-    # 1. Load Cursor
-    start_index = 0
-    if os.path.exists(CURSOR_FILE):
-        try:
-            with open(CURSOR_FILE, 'r') as f: start_index = int(f.read().strip())
-        except: start_index = 0
-
-    if start_index >= len(db): start_index = 0
-    print(f" > Cursor Position: {start_index} / {len(db)}")
+    verify(store, settings, state)
 
-    client = genai.Client(api_key=api_key)
-    # AUTO-DISCOVER MODEL
-    model_name = find_working_model(client)
-    print(f" > Using Model: {model_name}")
-    
-    prompt_template = settings.get("verification_prompt", "")
-    changes = False
-    current_index = start_index
-
-    # 2. Run Batches
-    for i in range(BATCHES_PER_RUN):
-        raw_batch = db[current_index : current_index + BATCH_SIZE]
-        if not raw_batch: 
-            current_index = 0 
-            break
-
-        # Filter out blanks
-        valid_payload = [
-            {"Team": t['Team'], "League": t['League'], "Sport": t['Sport']} 
-            for t in raw_batch 
-            if t.get('League') and str(t.get('League')).lower() != "unknown"
-        ]
-
-        print(f"   Batch {i+1}: Checking {len(valid_payload)} teams...")
-        
-        if valid_payload:
-            try:
-                prompt = prompt_template.replace("{batch_data}", json.dumps(valid_payload))
-                
-                response = client.models.generate_content(
-                    model=model_name,
-                    contents=prompt
-                )
-                
-                raw_text = clean_json(get_text(response))
-                if raw_text:
-                    corrections = json.loads(raw_text)
-                    if isinstance(corrections, dict): corrections = [corrections]
-                    
-                    if corrections:
-                        team_map = {t['Team']: t for t in db}
-                        for fix in corrections:
-                            t_name = fix.get("Team")
-                            correct_league = fix.get("League")
-                            if t_name in team_map:
-                                rec = team_map[t_name]
-                                if rec['League'] != correct_league:
-                                    print(f"     ⚠️ Correction: {t_name} -> {correct_league}")
-                                    rec['League'] = correct_league
-                                    rec['Status'] = "Modified"
-                                    changes = True
-            except Exception as e:
-                print(f"     [!] Batch Failed: {str(e)[:100]}")
-                if "429" in str(e): time.sleep(60)
-        
-        current_index += len(raw_batch)
-        if current_index >= len(db): current_index = 0
-        
-        if valid_payload: time.sleep(SLEEP_TIME)
-
-    if changes:
-        with open(DB_FILE, 'w') as f: json.dump(db, f, indent=4)
+    state.save()
+    if store.export():
         print(" > Database Updated.")
-        
-    with open(CURSOR_FILE, 'w') as f: f.write(str(current_index))
 
 if __name__ == "__main__":
-    main()
+    with metrics.run("verify_leagues"):
+        main()
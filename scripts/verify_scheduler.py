@@ -0,0 +1,95 @@
+import time
+
+from identity import team_key, scoped_key
+from persist import read_json, save_merged
+
+# ==========================================
+# PRIORITY VERIFICATION SCHEDULER
+# ==========================================
+STATE_FILE = 'scripts/verification_state.json'
+
+MIN_REVERIFY_DAYS = 7      # Confirmed records rest at least this long
+DAY = 24 * 3600
+
+# How likely a record's League is wrong, by how it got there
+STATUS_WEIGHT = {
+    "AI_Filled": 3.0,
+    "Modified": 2.5,
+    "Verified_Modified": 2.5,
+    "Resolved": 1.0,
+}
+RESOLVER_WEIGHT = {
+    "league_map": 0.2,      # Exact TSDB slug: rarely wrong
+    "alias": 0.5,
+}
+
+class VerificationState:
+    """
+    { scoped_key(Team, Sport): {league, verified, confidence, checks} } keyed
+    by stable team id (same as TeamStore), so appends and reorders of db.json
+    never shift the schedule and same-named teams of two sports keep their
+    own audits. Saves merge with audits another run wrote since this one loaded.
+    """
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.records = {}
+        self._base = read_json(path, {})
+        # Older states used other keys: re-key, keeping the latest audit.
+        # Entries without a sport stay under team_key and answer any sport
+        # until the name's first scoped audit replaces them
+        for key, rec in sorted(self._base.items(), key=lambda kv: kv[1].get('verified', 0)):
+            sport, _, name = key.rpartition('/')
+            self.records[scoped_key(name, sport) if sport else team_key(key)] = rec
+
+    def get(self, team, sport):
+        return self.records.get(scoped_key(team, sport)) or self.records.get(team_key(team))
+
+    def audited(self, rec):
+        """True if rec's current League was audited before (so it is only due by age)."""
+        st = self.get(rec['Team'], rec['Sport'])
+        return bool(st) and st.get('league') == rec['League']
+
+    def mark(self, team, sport, league, corrected, now=None):
+        """Records an audit. Confirmations raise confidence; corrections reset it."""
+        key = scoped_key(team, sport)
+        prev = self.get(team, sport) or {}
+        self.records.pop(team_key(team), None)
+        confidence = prev.get('confidence', 0.0) if prev.get('league') == league else 0.0
+        confidence = 0.25 if corrected else confidence + (1 - confidence) * 0.5
+        self.records[key] = {
+            'league': league,
+            'verified': int(now or time.time()),
+            'confidence': round(confidence, 3),
+            'checks': prev.get('checks', 0) + 1,
+        }
+
+    def save(self):
+        self._base = save_merged(self.path, self._base, self.records, indent=1, sort_keys=True)
+        self.records = dict(self._base)
+
+def priority(rec, state, now=None):
+    """
+    Higher is sooner. Never-verified and changed-since-verification records
+    come first; confirmed records come back as they age, slower the more
+    often they were confirmed. None means "not due".
+    """
+    now = now or time.time()
+    weight = RESOLVER_WEIGHT.get(rec.get('Resolver'), STATUS_WEIGHT.get(rec.get('Status'), 1.0))
+    if not state.audited(rec):
+        return 1000 + weight
+
+    st = state.get(rec['Team'], rec['Sport'])
+    age_days = (now - st.get('verified', 0)) / DAY
+    if age_days < MIN_REVERIFY_DAYS: return None
+    return weight * age_days / (1 + 4 * st.get('confidence', 0.0))
+
+def due(records, state, now=None):
+    """Verifiable records that are due, most urgent first."""
+    scored = []
+    for rec in records:
+        league = rec.get('League')
+        if not league or str(league).lower() == "unknown": continue
+        score = priority(rec, state, now)
+        if score is not None: scored.append((score, rec))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [rec for _, rec in scored]